@@ -0,0 +1,363 @@
+"""Offline benchmark for the German verb practice app.
+
+Starts a local stand-in for the OpenAI chat, speech and transcription endpoints (with configurable
+latency and failure injection), then drives the API helpers from german2.py with simulated concurrent
+users and runs concurrent full sessions of main() through Streamlit's AppTest.
+
+    python benchmark.py --users 20 --iterations 5 --latency-ms 400 --failure-rate 0.05
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "german2.py")
+
+# Canned content for the mock server
+MOCK_VERBS = [
+    ("gehen", "to go", "movement"), ("machen", "to make, to do", "daily_activities"),
+    ("sprechen", "to speak", "communication"), ("essen", "to eat", "daily_activities"),
+    ("trinken", "to drink", "daily_activities"), ("schreiben", "to write", "communication"),
+    ("lesen", "to read", "daily_activities"), ("kaufen", "to buy", "daily_activities"),
+    ("fahren", "to drive", "movement"), ("schlafen", "to sleep", "daily_activities"),
+    ("arbeiten", "to work", "work"), ("spielen", "to play", "leisure"),
+]
+MOCK_TRANSCRIPTION = "Ich gehe heute nach Hause"
+# Helper benchmark operations that make API requests; translation grading is local and left out of throughput
+API_OPERATIONS = ("verb", "sentence", "tts", "transcription", "pronunciation")
+
+
+def mock_verb():
+    german_verb, english_translation, category = random.choice(MOCK_VERBS)
+    return {
+        "german_verb": german_verb,
+        "english_translation": english_translation,
+        "sample_sentence_german": f"Wir {german_verb} heute zusammen.",
+        "sample_sentence_english": "We do it together today.",
+        "verb_category": category,
+    }
+
+
+def mock_chat_content(prompt_text):
+    """Build a reply that satisfies whichever schema the prompt asks for"""
+    if '"verbs"' in prompt_text:
+        return {"verbs": [mock_verb() for _ in range(5)]}
+    if "is_grammatically_correct" in prompt_text:
+        return {
+            "is_grammatically_correct": True,
+            "uses_target_verb_correctly": True,
+            "overall_score": "good",
+            "feedback": "Good sentence. Watch the word order in subordinate clauses.",
+            "corrected_sentence": "Wir gehen heute zusammen.",
+            "english_translation": "We go together today.",
+        }
+    if "is_correct" in prompt_text:
+        return {"is_correct": True}
+    if "specific_feedback" in prompt_text:
+        return {
+            "specific_feedback": "The 'ch' in 'ich' was a little hard.",
+            "suggestions": "Practice the ich-Laut slowly.",
+            "overall_feedback": "Nice work!",
+        }
+    return mock_verb()
+
+
+class MockOpenAIServer:
+    """Local stand-in for the OpenAI endpoints the app uses, with latency and failure injection"""
+
+    def __init__(self, latency_ms=300, jitter_ms=100, failure_rate=0.0, audio_bytes=24000):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.audio_bytes = audio_bytes
+        self.lock = threading.Lock()
+        self.request_counts = {}
+        self.failures_injected = 0
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def _delay(self):
+        time.sleep(max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                endpoint = self.path.split("/v1/", 1)[-1]
+                with server.lock:
+                    server.request_counts[endpoint] = server.request_counts.get(endpoint, 0) + 1
+                server._delay()
+
+                if random.random() < server.failure_rate:
+                    with server.lock:
+                        server.failures_injected += 1
+                    error = json.dumps({"error": {"message": "Rate limit reached (injected)", "type": "requests"}}).encode()
+                    self._send(429, error, headers={"Retry-After": "0.2"})
+                    return
+
+                if endpoint == "chat/completions":
+                    self._chat(json.loads(body))
+                elif endpoint == "audio/speech":
+                    self._send(200, b"ID3" + os.urandom(server.audio_bytes), content_type="audio/mpeg")
+                elif endpoint == "audio/transcriptions":
+                    self._send(200, json.dumps({"text": MOCK_TRANSCRIPTION}).encode())
+                else:
+                    self._send(404, b'{"error": {"message": "unknown endpoint"}}')
+
+            def _chat(self, request):
+                prompt_text = " ".join(str(message.get("content", "")) for message in request.get("messages", []))
+                content = json.dumps(mock_chat_content(prompt_text), ensure_ascii=False)
+                usage = {"prompt_tokens": len(prompt_text) // 4, "completion_tokens": len(content) // 4,
+                         "total_tokens": (len(prompt_text) + len(content)) // 4}
+                if not request.get("stream"):
+                    reply = {
+                        "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()),
+                        "model": request.get("model", "mock"),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                        "usage": usage,
+                    }
+                    self._send(200, json.dumps(reply).encode())
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for start in range(0, len(content), 12):
+                    chunk = {
+                        "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": request.get("model", "mock"),
+                        "choices": [{"index": 0, "delta": {"content": content[start:start + 12]}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(0.005)
+                final = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": request.get("model", "mock"), "choices": [], "usage": usage}
+                self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+                self.close_connection = True
+
+        return Handler
+
+
+def make_recording(seconds=2.0, sample_rate=44100):
+    """Stereo 16-bit WAV with half a second of silence on each side, like a phone recording"""
+    frames = []
+    total = int(seconds * sample_rate)
+    for index in range(total):
+        voiced = 0.5 * sample_rate < index < total - 0.5 * sample_rate
+        value = int(8000 * math.sin(2 * math.pi * 220 * index / sample_rate)) if voiced else 0
+        frames.append(struct.pack("<hh", value, value))
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(b"".join(frames))
+    return output.getvalue()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else float("nan")
+
+
+def run_helper_benchmark(german2, base_url, users, iterations):
+    """Simulated users calling the API helpers directly; returns per-operation latencies and errors"""
+    from openai import OpenAI
+
+    client = OpenAI(api_key="sk-benchmark", base_url=base_url)
+    recording = make_recording()
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+
+    def measure(operation, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.setdefault(operation, []).append(elapsed)
+            if result is None:
+                errors[operation] = errors.get(operation, 0) + 1
+        return result
+
+    def simulate_user(user_index):
+        level = german2.DIFFICULTY_LEVELS[user_index % len(german2.DIFFICULTY_LEVELS)]
+        for _ in range(iterations):
+            verb_data = measure("verb", german2.generate_verb_with_openai, client, level)
+            if verb_data is None:
+                continue
+            measure("translation", german2.grade_translation, verb_data["english_translation"], verb_data["english_translation"])
+            sentence = f"Wir {verb_data['german_verb']} heute."
+            measure("sentence", german2.check_german_sentence_with_openai, client, sentence, verb_data["german_verb"], level)
+            measure("tts", german2.generate_audio_with_openai, client, verb_data["sample_sentence_german"])
+            upload = io.BytesIO(recording)
+            upload.name = "recording.wav"
+            transcription = measure("transcription", german2.transcribe_audio_with_whisper, client, upload)
+            if transcription:
+                measure("pronunciation", german2.analyze_pronunciation_with_openai, client, sentence, transcription, level)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        list(executor.map(simulate_user, range(users)))
+    wall_seconds = time.perf_counter() - start
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latencies, errors, wall_seconds, peak_bytes
+
+
+def silence_streamlit_logs():
+    """Worker threads have no ScriptRunContext; Streamlit warns about it on every call"""
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+
+def init_apptest_worker(backend_url):
+    """Process initializer: AppTest keeps one global Runtime per process, so each concurrent session gets its own
+    process, and the processes share the pool, audio and sessions through the backend like app workers would"""
+    os.environ.setdefault("SHARED_BACKEND_URL", backend_url)
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+
+
+def run_apptest_session(timeout):
+    """One full main() session through AppTest: load, translate, check a sentence, next verb"""
+    from streamlit.testing.v1 import AppTest
+    import german2
+
+    silence_streamlit_logs()
+    app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    app.secrets["OPENAI_API_KEY"] = "sk-benchmark"
+    steps = [
+        ("load", lambda: app.run()),
+        ("translation", lambda: (app.text_input(key="translation_input").input("to go").run(),
+                                 app.button(key="check_translation").click().run())),
+        ("sentence", lambda: (app.text_area(key="sentence_input").input(
+            f"Wir {app.session_state.practice.current_verb_data['german_verb']} heute.").run(),
+            app.button(key="check_sentence").click().run())),
+        ("next_verb", lambda: app.button(key="next_verb").click().run()),
+    ]
+    timings = {}
+    failed = False
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            failed = True
+            break
+        timings[name] = time.perf_counter() - start
+        if app.exception:
+            failed = True
+            break
+    return timings, german2.deep_sizeof(app.session_state.to_dict()), failed
+
+
+def run_apptest_sessions(sessions, timeout):
+    """Concurrent full main() sessions, one process each; returns per-interaction latencies, footprints and failures"""
+    interactions = {}
+    footprints = []
+    failures = 0
+    backend_url = f"sqlite:///{os.path.join(os.getcwd(), 'apptest_shared.db')}"
+    with ProcessPoolExecutor(
+        max_workers=sessions, mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_apptest_worker, initargs=(backend_url,)
+    ) as executor:
+        for timings, footprint, failed in executor.map(run_apptest_session, [timeout] * sessions):
+            for name, seconds in timings.items():
+                interactions.setdefault(name, []).append(seconds)
+            footprints.append(footprint)
+            failures += failed
+    return interactions, footprints, failures
+
+
+def print_latency_table(title, latencies, errors=None):
+    print(f"\n{title}")
+    print(f"  {'operation':<16}{'calls':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for operation, values in latencies.items():
+        print(f"  {operation:<16}{len(values):>7}{(errors or {}).get(operation, 0):>8}"
+              f"{percentile(values, 0.5) * 1000:>10.1f}{percentile(values, 0.95) * 1000:>10.1f}{percentile(values, 0.99) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app against a local mock of the OpenAI API")
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users for the helper benchmark")
+    parser.add_argument("--iterations", type=int, default=3, help="verbs practiced per simulated user")
+    parser.add_argument("--latency-ms", type=float, default=300, help="mean mock latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="uniform jitter around the mean latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with HTTP 429")
+    parser.add_argument("--apptest-sessions", type=int, default=3, help="concurrent main() sessions run through AppTest (0 to skip)")
+    parser.add_argument("--workdir", default=None, help="directory for caches and metrics (default: a fresh temp dir)")
+    args = parser.parse_args()
+
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix="german2-bench-"))
+    server = MockOpenAIServer(args.latency_ms, args.jitter_ms, args.failure_rate).start()
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    print(f"Mock OpenAI server at {server.base_url}, working directory {os.getcwd()}")
+
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+    import german2
+
+    silence_streamlit_logs()
+
+    latencies, errors, wall_seconds, peak_bytes = run_helper_benchmark(german2, server.base_url, args.users, args.iterations)
+    operations = sum(len(latencies.get(operation, ())) for operation in API_OPERATIONS)
+    print_latency_table(f"Helper benchmark: {args.users} users x {args.iterations} verbs", latencies, errors)
+    print(f"  throughput: {operations / wall_seconds:.1f} API operations/s over {wall_seconds:.2f}s, peak traced memory {peak_bytes / 1024 / 1024:.1f} MB")
+
+    if args.apptest_sessions:
+        interactions, footprints, failures = run_apptest_sessions(args.apptest_sessions, timeout=max(30, args.latency_ms / 50))
+        print_latency_table(f"AppTest sessions: {args.apptest_sessions} concurrent", interactions)
+        if footprints:
+            print(f"  session state: {sum(footprints) / len(footprints) / 1024:.1f} KB average, failures {failures}")
+
+    with server.lock:
+        counts = dict(server.request_counts)
+    print(f"\nMock server requests: {json.dumps(counts)}, injected failures: {server.failures_injected}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Pre-generate the verb corpus and its audio ahead of time.
+
+Fills verb_corpus.db up to a target number of verbs per difficulty level and renders the word and sample
+sentence audio for every verb into the audio cache, so the app starts with a warm library. Every batch of
+verbs and every clip is stored as soon as it arrives, so an interrupted run resumes where it stopped.
+
+    OPENAI_API_KEY=sk-... python build_corpus.py --per-level 200 --concurrency 4
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import german2
+
+
+def generate_verbs(client, level, batch_size):
+    """One batch of new verbs for the level (a single verb when batch_size is 1)"""
+    if batch_size == 1:
+        verb_data = german2.generate_verb_with_openai(client, level)
+        return [verb_data] if verb_data else []
+    try:
+        return german2.request_verbs_batch_from_openai(client, level, batch_size)
+    except Exception as e:
+        print(f"  {level}: batch failed ({e})", file=sys.stderr)
+        return []
+
+
+def fill_level(client, corpus, level, target, batch_size, concurrency, max_idle_rounds):
+    """Generate until the level holds target verbs, deduplicated by lemma; returns the number added"""
+    known = {verb_data["german_verb"].lower() for verb_data in corpus.verbs(level)}
+    added = 0
+    idle_rounds = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while len(known) < target and idle_rounds < max_idle_rounds:
+            missing = target - len(known)
+            jobs = min(concurrency, -(-missing // batch_size))
+            futures = [executor.submit(generate_verbs, client, level, batch_size) for _ in range(jobs)]
+            new_verbs = []
+            for future in as_completed(futures):
+                for verb_data in future.result():
+                    lemma = verb_data["german_verb"].lower()
+                    if lemma not in known and len(known) < target:
+                        known.add(lemma)
+                        new_verbs.append(verb_data)
+            if new_verbs:
+                corpus.add(level, new_verbs)  # Checkpoint: this round survives an interruption
+                added += len(new_verbs)
+                idle_rounds = 0
+            else:
+                idle_rounds += 1  # The model keeps repeating known verbs (or failing); give up eventually
+            print(f"  {level}: {len(known)}/{target} verbs")
+    return added
+
+
+def render_audio(client, corpus, levels, concurrency):
+    """Render word and sentence audio for every corpus verb that is not cached yet; returns (rendered, failed)"""
+    audio_cache = german2.get_audio_cache()
+    texts = []
+    for level in levels:
+        for verb_data in corpus.verbs(level):
+            for text in (verb_data["german_verb"], verb_data["sample_sentence_german"]):
+                if text not in texts and not audio_cache.contains(german2.AudioCache.make_key(text)):
+                    texts.append(text)
+    print(f"Rendering {len(texts)} audio clips")
+
+    rendered = failed = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(german2.generate_audio_with_openai, client, text) for text in texts]
+        for index, future in enumerate(as_completed(futures), 1):
+            if future.result() is None:
+                failed += 1
+            else:
+                rendered += 1
+            if index % 50 == 0 or index == len(futures):
+                print(f"  audio: {index}/{len(futures)}")
+    return rendered, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate verbs and audio for the German verb practice app")
+    parser.add_argument("--levels", nargs="+", choices=german2.DIFFICULTY_LEVELS, default=german2.DIFFICULTY_LEVELS)
+    parser.add_argument("--per-level", type=int, default=100, help="target number of verbs per difficulty level")
+    parser.add_argument("--batch-size", type=int, default=german2.VERB_BATCH_SIZE, help="verbs requested per API call")
+    parser.add_argument("--concurrency", type=int, default=4, help="API calls in flight at once")
+    parser.add_argument("--max-idle-rounds", type=int, default=5, help="rounds without a new lemma before a level is given up")
+    parser.add_argument("--skip-audio", action="store_true", help="only generate verbs")
+    args = parser.parse_args()
+
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        parser.error("set OPENAI_API_KEY")
+
+    # No Streamlit session here, so silence the per-call "missing ScriptRunContext" warnings
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    client = german2.create_openai_client(api_key)
+    corpus = german2.get_verb_corpus()
+    start = time.perf_counter()
+
+    for level in args.levels:
+        print(f"Filling {level}")
+        added = fill_level(client, corpus, level, args.per_level, args.batch_size, args.concurrency, args.max_idle_rounds)
+        print(f"  {level}: added {added} verbs")
+
+    if not args.skip_audio:
+        rendered, failed = render_audio(client, corpus, args.levels, args.concurrency)
+        print(f"  audio: rendered {rendered}, failed {failed}")
+
+    counts = corpus.counts()
+    print(f"Done in {time.perf_counter() - start:.1f}s: " + ", ".join(f"{level} {counts.get(level, 0)}" for level in args.levels))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,171 @@
 import streamlit as st
 import random
-import base64
 from PIL import Image
 from io import BytesIO
+import numpy as np
 import json
+import re
+import os
+import hashlib
+import hmac
+import shutil
+import subprocess
+import wave
+import unicodedata
+from functools import lru_cache, wraps
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import sys
 import time
+import threading
+import sqlite3
+from collections import deque, OrderedDict
 import openai
 from openai import OpenAI
 import requests
+try:
+    import httpx
+except ImportError:  # httpx ships with openai; without it the client keeps its default transport
+    httpx = None
+try:
+    import redis
+except ImportError:  # Only needed when SHARED_BACKEND_URL points at a Redis server
+    redis = None
+try:
+    import tiktoken
+except ImportError:  # Prompt token counts fall back to a characters-per-token estimate
+    tiktoken = None
+
+# Tracing: per-stage wall time, tokens, audio bytes and cache status
+METRICS_PATH = "metrics.jsonl"
+METRICS_WINDOW = 1000  # Recent calls per stage kept in memory for percentiles
+METRICS_MAX_BYTES = int(os.environ.get("METRICS_MAX_MB", 50)) * 1024 * 1024  # Past this the file is rotated to metrics.jsonl.1
+METRICS_RERUN_SAMPLE_RATE = float(os.environ.get("METRICS_RERUN_SAMPLE_RATE", 0.1))  # Share of rerun_* spans written to disk
+current_span = contextvars.ContextVar("current_span", default=None)
+
+class MetricsRecorder:
+    """Appends traced calls to a size-capped JSONL file and keeps a recent window per stage for p50/p95
+    
+    Every span goes into the in-memory window; rerun_* spans, one per widget interaction, are sampled on disk.
+    """
+
+    def __init__(self, path=METRICS_PATH, window=METRICS_WINDOW, max_bytes=METRICS_MAX_BYTES,
+                 rerun_sample_rate=METRICS_RERUN_SAMPLE_RATE):
+        self.lock = threading.Lock()
+        self.window = window
+        self.recent = {}
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rerun_sample_rate = rerun_sample_rate
+        self.file_lock = threading.Lock()  # Separate so file writes never hold up percentile() readers
+        self.metrics_file = open(path, "a", encoding="utf-8")
+
+    def record(self, span):
+        with self.lock:
+            self.recent.setdefault(span["stage"], deque(maxlen=self.window)).append(span)
+        if span["stage"].startswith("rerun_") and random.random() >= self.rerun_sample_rate:
+            return
+        line = json.dumps(span) + "\n"
+        with self.file_lock:
+            if self.metrics_file.tell() + len(line) > self.max_bytes:
+                self.metrics_file.close()
+                os.replace(self.path, self.path + ".1")  # Keeps one previous file; older spans are dropped
+                self.metrics_file = open(self.path, "a", encoding="utf-8")
+            self.metrics_file.write(line)  # Buffered: written out in blocks rather than flushed per span
+
+    def percentile(self, stage, fraction, max_age_seconds=None, min_samples=1):
+        """Wall-time percentile in seconds over the recent window, or None with fewer than min_samples calls"""
+        oldest = time.time() - max_age_seconds if max_age_seconds else 0
+        with self.lock:
+            durations = sorted(span["seconds"] for span in self.recent.get(stage, ()) if span["ts"] >= oldest)
+        if not durations or len(durations) < min_samples:
+            return None
+        return durations[min(len(durations) - 1, int(fraction * len(durations)))]
+
+    def summary(self):
+        """Per-stage call count, p50/p95, error count, average tokens and bytes, and share served without an API call"""
+        with self.lock:
+            recent = {stage: list(spans) for stage, spans in self.recent.items()}
+        rows = {}
+        for stage, spans in sorted(recent.items()):
+            durations = sorted(span["seconds"] for span in spans)
+            cached = [span for span in spans if "cache" in span]
+            rows[stage] = {
+                "calls": len(spans),
+                "p50": durations[len(durations) // 2],
+                "p95": durations[min(len(durations) - 1, int(0.95 * len(durations)))],
+                "errors": sum(not span["ok"] for span in spans),
+                "tokens_in": sum(span.get("tokens_in", 0) for span in spans) / len(spans),
+                "tokens_out": sum(span.get("tokens_out", 0) for span in spans) / len(spans),
+                "tokens_cached": sum(span.get("tokens_cached", 0) for span in spans) / len(spans),
+                "audio_bytes": sum(span.get("audio_bytes", 0) for span in spans) / len(spans),
+                "cache_hits": sum(span["cache"] != "miss" for span in cached) / len(cached) if cached else None,
+            }
+        return rows
+
+@st.cache_resource
+def get_metrics_recorder():
+    """Single metrics recorder shared across reruns and sessions"""
+    return MetricsRecorder()
+
+def record_span(**fields):
+    """Attach token counts, byte counts or cache status to the traced call running in this thread"""
+    span = current_span.get()
+    if span is None:
+        return
+    for name, value in fields.items():
+        if name in ("tokens_in", "tokens_out", "tokens_cached", "audio_bytes"):
+            span[name] = span.get(name, 0) + (value or 0)
+        else:
+            span[name] = value
+
+def traced(stage):
+    """Decorator recording wall time and outcome of an API helper under the given stage name"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            span = {"stage": stage, "ts": time.time(), "ok": False}
+            token = current_span.set(span)
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+                span["ok"] = result is not None
+                return result
+            finally:
+                span["seconds"] = time.perf_counter() - start
+                current_span.reset(token)
+                get_metrics_recorder().record(span)
+        return wrapper
+    return decorator
+
+def record_usage(response):
+    """Copy prompt/completion token counts from a chat response (or final stream chunk) into the current span"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        record_span(
+            tokens_in=usage.prompt_tokens,
+            tokens_out=usage.completion_tokens,
+            tokens_cached=getattr(details, "cached_tokens", None)  # Prompt prefix served from the provider's cache
+        )
+
+# OpenAI connection pool settings
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", 50))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY_SECONDS", 30))
+
+@st.cache_resource
+def create_openai_client(api_key, base_url=None):
+    """One OpenAI client per API key and server, with a pooled keep-alive HTTP transport shared across reruns and sessions"""
+    # Retries are handled by the shared APIScheduler, which also honours Retry-After across sessions
+    if httpx is None:
+        return OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+    limits = httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS
+    )
+    return OpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=openai.DefaultHttpxClient(limits=limits))
 
 # OpenAI Configuration
 def get_openai_client():
@@ -21,46 +179,744 @@ def get_openai_client():
                 st.error("Please provide your OpenAI API key to use this app.")
                 st.stop()
         
-        client = OpenAI(api_key=api_key)
+        # Reuse the pooled client for this key instead of opening new connections on every rerun
+        client = create_openai_client(api_key)
         return client
     except Exception as e:
         st.error(f"Error initializing OpenAI client: {e}")
         return None
 
-# Function to generate German verb data using OpenAI
-def generate_verb_with_openai(client, difficulty_level="beginner"):
-    """Generate a German verb with translations, example sentences, and image description using OpenAI"""
+# Shared API scheduler: per-endpoint rate limits, retries with backoff and single-flight coalescing
+API_RATE_LIMITS = {  # endpoint: (requests per second, burst)
+    "chat": (float(os.environ.get("OPENAI_CHAT_RPS", 8)), 16),
+    "speech": (float(os.environ.get("OPENAI_SPEECH_RPS", 4)), 8),
+    "transcription": (float(os.environ.get("OPENAI_TRANSCRIPTION_RPS", 4)), 8),
+}
+API_MAX_RETRIES = 4
+API_BACKOFF_BASE_SECONDS = 0.5
+API_BACKOFF_MAX_SECONDS = 20.0
+API_MIN_RATE_FRACTION = 0.1  # Adaptive limiter never drops below this share of the configured rate
+
+class TokenBucket:
+    """Blocking token bucket that halves its rate on a 429 and creeps back to the configured rate on success"""
+
+    def __init__(self, rate, capacity):
+        self.lock = threading.Lock()
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def acquire(self):
+        """Wait until a token is available; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def throttle(self, pause_seconds):
+        """Rate limited: hold every caller for pause_seconds and halve the rate"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + pause_seconds)
+            self.rate = max(self.max_rate * API_MIN_RATE_FRACTION, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def relax(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+class InFlightCall:
+    """Result slot shared by every caller coalesced onto one request"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class APIScheduler:
+    """All OpenAI calls go through call(); retries live here, so the client itself is built with max_retries=0"""
+
+    RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+    def __init__(self, rate_limits=API_RATE_LIMITS):
+        self.lock = threading.Lock()
+        self.buckets = {endpoint: TokenBucket(rate, burst) for endpoint, (rate, burst) in rate_limits.items()}
+        self.in_flight = {}
+        self.counters = {"calls": 0, "retries": 0, "rate_limited": 0, "coalesced": 0, "gave_up": 0}
+        self.wait_seconds = 0.0
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def call(self, endpoint, fn, *args, coalesce_key=None, **kwargs):
+        """Run fn under the endpoint's limiter with retries; identical coalesce_keys in flight share one call"""
+        if coalesce_key is None:
+            return self._call_with_retries(endpoint, fn, *args, **kwargs)
+
+        key = (endpoint, coalesce_key)
+        with self.lock:
+            slot = self.in_flight.get(key)
+            leader = slot is None
+            if leader:
+                slot = self.in_flight[key] = InFlightCall()
+            else:
+                self.counters["coalesced"] += 1
+        if not leader:
+            slot.done.wait()
+            if slot.error is not None:
+                raise slot.error
+            return slot.result
+
+        try:
+            slot.result = self._call_with_retries(endpoint, fn, *args, **kwargs)
+            return slot.result
+        except Exception as e:
+            slot.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            slot.done.set()
+
+    def _call_with_retries(self, endpoint, fn, *args, **kwargs):
+        bucket = self.buckets[endpoint]
+        attempt = 0
+        while True:
+            waited = bucket.acquire()
+            with self.lock:
+                self.counters["calls"] += 1
+                self.wait_seconds += waited
+            try:
+                result = fn(*args, **kwargs)
+            except openai.APITimeoutError:
+                # The call already used up its deadline; the caller decides what next (the router tries another model)
+                raise
+            except self.RETRYABLE_ERRORS as e:
+                retry_after = self.retry_after_seconds(e)
+                if isinstance(e, openai.RateLimitError):
+                    self.count("rate_limited")
+                    bucket.throttle(retry_after or API_BACKOFF_BASE_SECONDS)
+                if attempt >= API_MAX_RETRIES:
+                    self.count("gave_up")
+                    raise
+                # Full jitter keeps a classroom of clients from retrying in lockstep
+                backoff = random.uniform(0, min(API_BACKOFF_MAX_SECONDS, API_BACKOFF_BASE_SECONDS * 2 ** attempt))
+                time.sleep(max(backoff, retry_after or 0.0))
+                attempt += 1
+                self.count("retries")
+                record_span(retries=attempt)
+                continue
+            bucket.relax()
+            return result
+
+    @staticmethod
+    def retry_after_seconds(error):
+        """Server-requested delay from retry-after-ms or retry-after headers, if any"""
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        headers = response.headers
+        try:
+            if "retry-after-ms" in headers:
+                return float(headers["retry-after-ms"]) / 1000
+            if "retry-after" in headers:
+                return min(API_BACKOFF_MAX_SECONDS, float(headers["retry-after"]))
+        except ValueError:
+            return None  # HTTP-date form; fall back to our own backoff
+        return None
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["wait_seconds"] = self.wait_seconds
+            stats["in_flight"] = len(self.in_flight)
+        stats["rates"] = {endpoint: bucket.rate for endpoint, bucket in self.buckets.items()}
+        return stats
+
+@st.cache_resource
+def get_api_scheduler():
+    """Single API scheduler shared across reruns and sessions"""
+    return APIScheduler()
+
+# Shared state backend: lets several app processes share the verb pool, audio, evaluations and sessions
+SHARED_BACKEND_URL = os.environ.get("SHARED_BACKEND_URL", "memory://")  # or sqlite:///path.db, redis://host:6379/0
+
+class MemoryBackend:
+    """In-process key/value and queue store; the default for a single worker"""
+
+    shared = False  # Caches that already keep their own in-process copy skip this layer
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.queues = {}
+        self.writes = 0
+
+    def get(self, namespace, key):
+        with self.lock:
+            entry = self.values.get((namespace, key))
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] < time.time():
+                del self.values[(namespace, key)]
+                return None
+            return entry[0]
+
+    def set(self, namespace, key, value, ttl_seconds=None):
+        now = time.time()
+        with self.lock:
+            self.values[(namespace, key)] = (value, now + ttl_seconds if ttl_seconds else None)
+            self.writes += 1
+            if self.writes % 500 == 0:
+                self.values = {item: entry for item, entry in self.values.items() if entry[1] is None or entry[1] >= now}
+
+    def delete(self, namespace, key):
+        with self.lock:
+            self.values.pop((namespace, key), None)
+
+    def push(self, namespace, key, value):
+        with self.lock:
+            self.queues.setdefault((namespace, key), deque()).append(value)
+
+    def pop(self, namespace, key):
+        with self.lock:
+            queue = self.queues.get((namespace, key))
+            return queue.popleft() if queue else None
+
+    def length(self, namespace, key):
+        with self.lock:
+            return len(self.queues.get((namespace, key), ()))
+
+    def items(self, namespace, key):
+        with self.lock:
+            return list(self.queues.get((namespace, key), ()))
+
+class SQLiteBackend:
+    """Key/value and queue store in a WAL-mode SQLite file, shared by every worker on the host"""
+
+    shared = True
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.writes = 0
+        # Autocommit, so pop() can hold an explicit write transaction across processes
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS kv (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    expires REAL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_key ON queue (namespace, key, id)")
+
+    def get(self, namespace, key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ? AND (expires IS NULL OR expires >= ?)",
+                (namespace, key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, namespace, key, value, ttl_seconds=None):
+        expires = time.time() + ttl_seconds if ttl_seconds else None
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?, ?)", (namespace, key, value, expires))
+            self.writes += 1
+            if self.writes % 500 == 0:
+                self.conn.execute("DELETE FROM kv WHERE expires < ?", (time.time(),))
+
+    def delete(self, namespace, key):
+        with self.lock:
+            self.conn.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def push(self, namespace, key, value):
+        with self.lock:
+            self.conn.execute("INSERT INTO queue (namespace, key, value) VALUES (?, ?, ?)", (namespace, key, value))
+
+    def pop(self, namespace, key):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT id, value FROM queue WHERE namespace = ? AND key = ? ORDER BY id LIMIT 1", (namespace, key)
+                ).fetchone()
+                if row:
+                    self.conn.execute("DELETE FROM queue WHERE id = ?", (row[0],))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return row[1] if row else None
+
+    def length(self, namespace, key):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM queue WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()[0]
+
+    def items(self, namespace, key):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT value FROM queue WHERE namespace = ? AND key = ? ORDER BY id", (namespace, key)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+class RedisBackend:
+    """Key/value and queue store on a Redis-protocol server, shared by workers on any host"""
+
+    shared = True
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+
+    @staticmethod
+    def _key(namespace, key):
+        return f"german2:{namespace}:{key}"
+
+    def get(self, namespace, key):
+        return self.client.get(self._key(namespace, key))
+
+    def set(self, namespace, key, value, ttl_seconds=None):
+        self.client.set(self._key(namespace, key), value, ex=int(ttl_seconds) if ttl_seconds else None)
+
+    def delete(self, namespace, key):
+        self.client.delete(self._key(namespace, key))
+
+    def push(self, namespace, key, value):
+        self.client.rpush(self._key(namespace, key), value)
+
+    def pop(self, namespace, key):
+        return self.client.lpop(self._key(namespace, key))
+
+    def length(self, namespace, key):
+        return self.client.llen(self._key(namespace, key))
+
+    def items(self, namespace, key):
+        return self.client.lrange(self._key(namespace, key), 0, -1)
+
+def create_shared_backend(url):
+    """Backend for a memory://, sqlite:///path or redis:// URL"""
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        if redis is None:
+            raise RuntimeError("SHARED_BACKEND_URL points at Redis but the redis package is not installed")
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported SHARED_BACKEND_URL: {url}")
+
+@st.cache_resource
+def get_shared_backend():
+    """Single backend connection shared across reruns and sessions"""
+    return create_shared_backend(SHARED_BACKEND_URL)
+
+# Structured (JSON) chat responses shared by all chat helpers
+RESPONSE_SCHEMAS = {
+    "verb": {"german_verb": str, "english_translation": str, "sample_sentence_german": str, "sample_sentence_english": str, "verb_category": str},
+    "verb_batch": {"verbs": list},
+    "sentence_evaluation": {
+        "is_grammatically_correct": bool, "uses_target_verb_correctly": bool, "overall_score": str,
+        "feedback": str, "corrected_sentence": str, "english_translation": str
+    },
+    "translation_check": {"is_correct": bool},
+    "pronunciation_feedback": {"specific_feedback": str, "suggestions": str, "overall_feedback": str},
+}
+
+class ResponseStats:
+    """Process-wide counters for JSON parsing problems and the re-clicks the repair layer saved"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"responses": 0, "extracted": 0, "parse_failures": 0, "repairs_succeeded": 0, "failed": 0}
+        self.models_without_json_mode = set()
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def snapshot(self):
+        with self.lock:
+            counts = dict(self.counts)
+        counts["retries_saved"] = counts["extracted"] + counts["repairs_succeeded"]
+        return counts
+
+@st.cache_resource
+def get_response_stats():
+    """Single set of response counters shared across reruns and sessions"""
+    return ResponseStats()
+
+def extract_json_object(text):
+    """Parse the first balanced JSON object in a reply, ignoring markdown fences and surrounding prose"""
+    text = re.sub(r"^\s*```(?:json)?|```\s*$", "", text.strip(), flags=re.IGNORECASE).strip()
+    start = text.find("{")
+    while start != -1:
+        depth, in_string, escaped = 0, False, False
+        for end in range(start, len(text)):
+            char = text[end]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    try:
+                        return json.loads(text[start:end + 1])
+                    except json.JSONDecodeError:
+                        break
+        start = text.find("{", start + 1)
+    raise json.JSONDecodeError("No JSON object found in response", text, 0)
+
+def schema_problems(data, endpoint):
+    """Describe how a parsed reply deviates from the endpoint schema; empty list if it conforms"""
+    if not isinstance(data, dict):
+        return ["the reply is not a JSON object"]
+    problems = []
+    for field, expected_type in RESPONSE_SCHEMAS[endpoint].items():
+        if field not in data:
+            problems.append(f'missing field "{field}"')
+        elif not isinstance(data[field], expected_type):
+            problems.append(f'field "{field}" must be a {expected_type.__name__}')
+    return problems
+
+def parse_structured_reply(content, endpoint):
+    """Return (data, problem, extracted) for a raw reply; problem is None when the reply is usable"""
+    extracted = False
+    try:
+        data = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        try:
+            data = extract_json_object(content or "")
+            extracted = True
+        except json.JSONDecodeError as e:
+            return None, f"the reply is not valid JSON ({e.msg})", False
+    problems = schema_problems(data, endpoint)
+    return data, "; ".join(problems) or None, extracted
+
+# Model routing: per task, the candidate models in order of preference with the token budget and temperature.
+# "levels" overrides any setting per difficulty, "base_url" sends the task to another OpenAI-compatible
+# server (e.g. a local one for offline runs), and "timeout_seconds" sets the per-call deadline.
+# MODEL_ROUTES_JSON merges over these defaults per task.
+MODEL_ROUTES = {
+    "verb": {"models": ["gpt-3.5-turbo", "gpt-4o-mini"], "max_tokens": 300, "temperature": 0.7, "slo_seconds": 4.0},
+    # Higher temperature keeps the verbs within a batch varied; the budget scales with the count, so the call site passes max_tokens
+    "verb_batch": {"models": ["gpt-3.5-turbo", "gpt-4o-mini"], "temperature": 0.9, "slo_seconds": 15.0},
+    "sentence_evaluation": {
+        "models": ["gpt-3.5-turbo", "gpt-4o-mini"], "max_tokens": 500, "temperature": 0.3, "slo_seconds": 6.0,
+        "levels": {
+            "beginner": {"max_tokens": 400},
+            "advanced": {"models": ["gpt-4o-mini", "gpt-3.5-turbo"], "max_tokens": 600, "slo_seconds": 8.0}
+        }
+    },
+    "translation_check": {"models": ["gpt-3.5-turbo", "gpt-4o-mini"], "max_tokens": 20, "temperature": 0, "slo_seconds": 2.0},
+    "pronunciation_feedback": {
+        "models": ["gpt-3.5-turbo", "gpt-4o-mini"], "max_tokens": 350, "temperature": 0.3, "slo_seconds": 6.0,
+        "levels": {"advanced": {"models": ["gpt-4o-mini", "gpt-3.5-turbo"]}}
+    },
+}
+MODEL_ROUTES_OVERRIDES = json.loads(os.environ.get("MODEL_ROUTES_JSON", "{}"))
+ROUTER_WINDOW_SECONDS = float(os.environ.get("ROUTER_WINDOW_SECONDS", 300))  # Only recent calls count towards a model's p95
+ROUTER_MIN_SAMPLES = int(os.environ.get("ROUTER_MIN_SAMPLES", 5))  # Fewer calls than this and the model is assumed healthy
+ROUTER_TIMEOUT_SLO_MULTIPLE = float(os.environ.get("ROUTER_TIMEOUT_SLO_MULTIPLE", 3))  # Per-call deadline unless a route sets timeout_seconds
+
+class ModelRouter:
+    """Chooses model, token budget and temperature per task and difficulty, moving off models that miss their latency SLO"""
+
+    def __init__(self, routes, overrides=None):
+        self.routes = {}
+        for task, route in routes.items():
+            self.routes[task] = {**route, **(overrides or {}).get(task, {})}
+        self.lock = threading.Lock()
+        self.counters = {"routed": 0, "slo_fallbacks": 0, "error_fallbacks": 0}
+
+    @staticmethod
+    def stage(task, model):
+        """Metrics stage holding one model's latency for one task"""
+        return f"model:{task}:{model}"
+
+    def settings(self, task, difficulty_level=None):
+        """Route settings for the task with the difficulty overrides applied"""
+        route = self.routes[task]
+        settings = {name: value for name, value in route.items() if name != "levels"}
+        settings.update(route.get("levels", {}).get(difficulty_level, {}))
+        return settings
+
+    def candidates(self, task, difficulty_level=None):
+        """(settings, models): models within their SLO in order of preference, then the slow ones fastest first"""
+        settings = self.settings(task, difficulty_level)
+        recorder = get_metrics_recorder()
+        healthy, slow = [], []
+        for model in settings["models"]:
+            p95 = recorder.percentile(self.stage(task, model), 0.95, ROUTER_WINDOW_SECONDS, ROUTER_MIN_SAMPLES)
+            if p95 is not None and p95 > settings["slo_seconds"]:
+                slow.append((p95, model))
+            else:
+                healthy.append(model)
+        models = healthy + [model for _, model in sorted(slow)]
+        with self.lock:
+            self.counters["routed"] += 1
+            if models[0] != settings["models"][0]:
+                self.counters["slo_fallbacks"] += 1
+        return settings, models
+
+    def observe(self, task, model, start_ts, seconds, ok):
+        """Record one call's latency for the model; an expired window lets a recovered primary back in"""
+        get_metrics_recorder().record({"stage": self.stage(task, model), "ts": start_ts, "seconds": seconds, "ok": ok})
+
+    def note_error_fallback(self):
+        with self.lock:
+            self.counters["error_fallbacks"] += 1
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        recorder = get_metrics_recorder()
+        stats["tasks"] = {}
+        for task in self.routes:
+            settings = self.settings(task)
+            p95s = {
+                model: recorder.percentile(self.stage(task, model), 0.95, ROUTER_WINDOW_SECONDS)
+                for model in settings["models"]
+            }
+            stats["tasks"][task] = {"slo_seconds": settings["slo_seconds"], "base_url": settings.get("base_url"), "p95": p95s}
+        return stats
+
+@st.cache_resource
+def get_model_router():
+    """Single model router shared across reruns and sessions"""
+    return ModelRouter(MODEL_ROUTES, MODEL_ROUTES_OVERRIDES)
+
+def create_chat_completion(client, **params):
+    """chat.completions.create in JSON mode, retrying without it for models or servers that reject it"""
+    stats = get_response_stats()
+    scheduler = get_api_scheduler()
+    if params["model"] not in stats.models_without_json_mode:
+        try:
+            return scheduler.call("chat", client.chat.completions.create, response_format={"type": "json_object"}, **params)
+        except openai.BadRequestError as e:
+            if "response_format" not in str(e):
+                raise
+            stats.models_without_json_mode.add(params["model"])
+    return scheduler.call("chat", client.chat.completions.create, **params)
+
+def request_structured_json(client, endpoint, messages, on_chunk=None, difficulty_level=None, **params):
+    """Chat completion for the endpoint's task on the model the router picks, falling back to the next model on API errors
+    
+    Explicit params (e.g. max_tokens) override the route settings. Raises like complete_structured_json.
+    """
+    router = get_model_router()
+    settings, models = router.candidates(endpoint, difficulty_level)
+    if settings.get("base_url"):
+        client = create_openai_client(client.api_key, settings["base_url"])
+    route_params = {name: settings[name] for name in ("max_tokens", "temperature") if name in settings}
+    # A hung model must not hold the learner for the SDK's 600 s default; a timeout moves on to the next model
+    route_params["timeout"] = settings.get("timeout_seconds", ROUTER_TIMEOUT_SLO_MULTIPLE * settings["slo_seconds"])
+    route_params.update(params)
+    streamed = []
+    
+    def forward_chunk(delta):
+        streamed.append(delta)
+        on_chunk(delta)
+    
+    for index, model in enumerate(models):
+        start_ts = time.time()
+        start = time.perf_counter()
+        ok = False
+        try:
+            data = complete_structured_json(
+                client, endpoint, messages, on_chunk=forward_chunk if on_chunk else None, model=model, **route_params
+            )
+            ok = True
+            record_span(model=model)
+            return data
+        except (openai.APIConnectionError, openai.APIStatusError):
+            # Half a streamed reply cannot be taken back, and the last model has nobody to hand over to
+            if streamed or index == len(models) - 1:
+                raise
+            router.note_error_fallback()
+        finally:
+            router.observe(endpoint, model, start_ts, time.perf_counter() - start, ok)
+
+def complete_structured_json(client, endpoint, messages, on_chunk=None, **params):
+    """Chat completion parsed and validated against RESPONSE_SCHEMAS[endpoint], with one targeted repair retry
+    
+    With on_chunk the reply is streamed and on_chunk(text) is called for every content delta.
+    Raises json.JSONDecodeError if the reply is still unusable after the repair.
+    """
+    stats = get_response_stats()
+    stats.count("responses")
+    if on_chunk is None:
+        response = create_chat_completion(client, messages=messages, **params)
+        record_usage(response)
+        content = response.choices[0].message.content
+    else:
+        response = create_chat_completion(
+            client, messages=messages, stream=True, stream_options={"include_usage": True}, **params
+        )
+        parts = []
+        for chunk in response:
+            record_usage(chunk)  # Only the final chunk carries usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                on_chunk(delta)
+        content = "".join(parts)
+    
+    data, problem, extracted = parse_structured_reply(content, endpoint)
+    if problem is None:
+        if extracted:
+            stats.count("extracted")  # A plain json.loads would have failed here
+        return data
+    stats.count("parse_failures")
     
-    prompt = f"""
-    Generate a random German verb suitable for {difficulty_level} level learners. 
-    Provide the response in the following JSON format:
+    # One repair round trip: show the model its reply and exactly what was wrong with it
+    fields = ", ".join(RESPONSE_SCHEMAS[endpoint])
+    repair_messages = messages + [
+        {"role": "assistant", "content": content or ""},
+        {"role": "user", "content": f"That reply could not be used: {problem}. Respond again with only a JSON object with the fields: {fields}."}
+    ]
+    response = create_chat_completion(client, messages=repair_messages, **params)
+    record_usage(response)
+    content = response.choices[0].message.content
+    data, problem, _ = parse_structured_reply(content, endpoint)
+    if problem is None:
+        stats.count("repairs_succeeded")
+        return data
+    stats.count("failed")
+    raise json.JSONDecodeError(f"Invalid {endpoint} response: {problem}", content or "", 0)
+
+# Prompt templates: instructions and the response format live in a system message compiled once, so every
+# request for a task starts with the same bytes (provider prompt caching matches on that prefix) and only a
+# short user message at the end carries the learner's data
+PROMPT_TOKEN_ENCODING = "cl100k_base"
+PROMPT_CHARS_PER_TOKEN = 4  # Estimate used when tiktoken is not installed
+
+@st.cache_resource
+def get_token_encoding():
+    """tiktoken encoding for prompt token counts, or None to use the estimate"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(PROMPT_TOKEN_ENCODING)
+    except Exception:
+        return None  # The vocabulary is downloaded on first use, which fails offline
+
+def count_tokens(text):
+    """Prompt tokens in text, counted with tiktoken when available"""
+    encoding = get_token_encoding()
+    if encoding is None:
+        return -(-len(text) // PROMPT_CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+def compact_prompt(text):
+    """Strip the indentation and blank lines a triple-quoted prompt picks up, and collapse runs of spaces"""
+    return "\n".join(" ".join(line.split()) for line in text.strip().splitlines() if line.strip())
+
+class PromptTemplate:
+    """A chat prompt compiled once: a static system prefix shared by every call and a user message holding the variable data"""
 
-    {{
-        "german_verb": "the German verb",
-        "english_translation": "the English translation (include 'to' for infinitive)",
-        "sample_sentence_german": "a simple German sentence using this verb",
-        "sample_sentence_english": "English translation of the German sentence",
-        "verb_category": "category like 'movement', 'daily_activities', 'communication', etc."
-    }}
+    def __init__(self, name, system, user):
+        self.name = name
+        self.system = compact_prompt(system)
+        self.user = compact_prompt(user)
+        self.prefix_tokens = None  # Counted on first use so importing the app never waits on tiktoken
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.variable_tokens = 0
+        PROMPT_TEMPLATES[name] = self
 
-    Make sure the verb is commonly used and appropriate for language learning.
+    def messages(self, **values):
+        """Chat messages for one call; records the prefix and variable token counts on the current span"""
+        if self.prefix_tokens is None:
+            self.prefix_tokens = count_tokens(self.system)
+        user = self.user.format(**values)
+        variable_tokens = count_tokens(user)
+        with self.lock:
+            self.calls += 1
+            self.variable_tokens += variable_tokens
+        record_span(prompt_prefix_tokens=self.prefix_tokens, prompt_variable_tokens=variable_tokens)
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": user}
+        ]
+
+PROMPT_TEMPLATES = {}  # name -> PromptTemplate, for the admin panel
+
+# Single verbs and batches share one system prefix; only the user message says how many verbs to return
+VERB_SYSTEM_PROMPT = """
+    You are a German language teacher creating educational content. Always respond with valid JSON.
+    Every verb you generate is an object in the following JSON format:
+    {"german_verb": "the German verb",
+    "english_translation": "the English translation (include 'to' for infinitive)",
+    "sample_sentence_german": "a simple German sentence using this verb",
+    "sample_sentence_english": "English translation of the German sentence",
+    "verb_category": "category like 'movement', 'daily_activities', 'communication', etc."}
+    Make sure the verbs are commonly used and appropriate for language learning.
     Keep sentences simple and practical.
-    """
+"""
+VERB_PROMPT = PromptTemplate(
+    "verb",
+    VERB_SYSTEM_PROMPT,
+    "Generate a random German verb suitable for {difficulty_level} level learners. Respond with the verb object."
+)
+VERB_BATCH_PROMPT = PromptTemplate(
+    "verb_batch",
+    VERB_SYSTEM_PROMPT,
+    'Generate {count} different random German verbs suitable for {difficulty_level} level learners. '
+    'Respond with a JSON object with a "verbs" array holding one verb object per verb.'
+)
+
+# Function to generate German verb data using OpenAI
+@traced("verb_generation")
+def request_verb_from_openai(client, difficulty_level="beginner"):
+    """Ask OpenAI for one German verb and return the parsed dict (raises on failure)"""
+    verb_data = request_structured_json(
+        client,
+        "verb",
+        messages=VERB_PROMPT.messages(difficulty_level=difficulty_level),
+        difficulty_level=difficulty_level
+    )
+    
+    verb_data = validate_verb_data(verb_data)
+    if verb_data is None:
+        raise ValueError("response is missing one of the verb fields")
+    return verb_data
 
+def generate_verb_with_openai(client, difficulty_level="beginner"):
+    """Generate a German verb with translations, example sentences, and image description using OpenAI"""
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a German language teacher creating educational content. Always respond with valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=300,
-            temperature=0.7
-        )
-        
-        # Parse the JSON response
-        verb_data = json.loads(response.choices[0].message.content)
-        return verb_data
+        return request_verb_from_openai(client, difficulty_level)
         
     except json.JSONDecodeError as e:
         st.error(f"Error parsing OpenAI response: {e}")
@@ -69,44 +925,494 @@ def generate_verb_with_openai(client, difficulty_level="beginner"):
         st.error(f"Error calling OpenAI API: {e}")
         return None
 
-# Function to check German sentence using OpenAI
-def check_german_sentence_with_openai(client, user_sentence, target_verb, difficulty_level="beginner"):
-    """Use OpenAI to evaluate the German sentence for grammar, structure, and correctness"""
+# Fields every generated verb must carry
+VERB_FIELDS = ("german_verb", "english_translation", "sample_sentence_german", "sample_sentence_english", "verb_category")
+VERB_BATCH_SIZE = 5  # Verbs requested per batch completion
+
+def validate_verb_data(verb_data):
+    """Return a cleaned copy of the verb dict, or None if any of the five fields is missing or empty"""
+    if not isinstance(verb_data, dict):
+        return None
+    cleaned = {}
+    for field in VERB_FIELDS:
+        value = verb_data.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return None
+        cleaned[field] = value.strip()
+    return cleaned
+
+# Function to generate several German verbs in one completion
+@traced("verb_batch")
+def request_verbs_batch_from_openai(client, difficulty_level="beginner", count=VERB_BATCH_SIZE):
+    """Ask OpenAI for an array of verbs; drops invalid entries and duplicate lemmas (raises on failure)"""
+    # JSON mode only allows objects at the top level, so the array comes wrapped in {"verbs": [...]}
+    entries = request_structured_json(
+        client,
+        "verb_batch",
+        messages=VERB_BATCH_PROMPT.messages(count=count, difficulty_level=difficulty_level),
+        difficulty_level=difficulty_level,
+        max_tokens=150 * count
+    )["verbs"]
     
-    prompt = f"""
-    As a German language teacher, please evaluate this German sentence written by a {difficulty_level} level student:
+    verbs = []
+    seen_lemmas = set()
+    for entry in entries:
+        verb_data = validate_verb_data(entry)
+        if verb_data is None:
+            continue
+        lemma = verb_data["german_verb"].lower()
+        if lemma in seen_lemmas:
+            continue
+        seen_lemmas.add(lemma)
+        verbs.append(verb_data)
+    return verbs
 
-    Student's sentence: "{user_sentence}"
-    Target verb to use: "{target_verb}"
+# Sentence evaluation cache settings
+EVALUATION_CACHE_TTL_SECONDS = 24 * 3600
+EVALUATION_CACHE_MAX_ENTRIES = 5000
+
+class EvaluationCache:
+    """Process-wide TTL + LRU cache of sentence evaluations keyed on the normalized sentence, verb and level"""
+
+    def __init__(self, max_entries=EVALUATION_CACHE_MAX_ENTRIES, ttl_seconds=EVALUATION_CACHE_TTL_SECONDS, backend=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend if backend is not None and backend.shared else None  # Second level shared with other workers
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_sentence(sentence):
+        """Lowercase, drop punctuation and collapse whitespace so trivially different submissions share a key"""
+        without_punctuation = "".join(
+            " " if unicodedata.category(char).startswith("P") else char for char in sentence.lower()
+        )
+        return " ".join(without_punctuation.split())
+
+    @classmethod
+    def make_key(cls, user_sentence, target_verb, difficulty_level):
+        return (cls.normalize_sentence(user_sentence), target_verb.lower().strip(), difficulty_level)
+
+    def get(self, key):
+        """Return a copy of the cached evaluation, or None if missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+        stored = self.backend.get("evaluation", json.dumps(key)) if self.backend else None
+        with self.lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        evaluation = json.loads(stored)
+        self._remember(key, evaluation)
+        return dict(evaluation)
+
+    def put(self, key, evaluation):
+        self._remember(key, evaluation)
+        if self.backend:
+            self.backend.set("evaluation", json.dumps(key), json.dumps(evaluation), self.ttl_seconds)
+
+    def _remember(self, key, evaluation):
+        with self.lock:
+            self.entries[key] = (time.time(), dict(evaluation))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+            }
+
+@st.cache_resource
+def get_evaluation_cache():
+    """Single evaluation cache shared across reruns and sessions"""
+    return EvaluationCache(backend=get_shared_backend())
+
+# Local sentence pre-check: conjugation tables for the target verb and a cheap language check
+# Longest first, so "herein" wins over "her"
+SEPARABLE_PREFIXES = (
+    "zusammen", "entgegen", "zurück", "kennen", "weiter", "heraus", "herein", "hinaus", "herum", "vorbei", "nieder",
+    "statt", "fern", "fest", "fort", "frei", "heim", "hoch", "nach", "teil", "dar", "weg", "auf", "aus", "bei", "ein",
+    "mit", "vor", "los", "her", "hin", "ab", "an", "um", "zu"
+)
+INSEPARABLE_PREFIXES = ("miss", "emp", "ent", "ver", "zer", "be", "er", "ge")
+IRREGULAR_VERB_FORMS = {
+    "sein": "bin bist ist sind seid war warst waren wart gewesen sei wäre wärst wären wärt",
+    "haben": "habe hab hast hat habt hatte hattest hatten hattet gehabt hätte hättest hätten hättet",
+    "werden": "werde wirst wird werdet wurde wurdest wurden wurdet geworden worden würde würdest würden würdet",
+    "wissen": "weiß weißt wisst wusste wusstest wussten wusstet gewusst wüsste wüssten",
+    "tun": "tue tu tust tut tat tatest taten tatet getan täte täten",
+    "können": "kann kannst könnt konnte konntest konnten konntet gekonnt könnte könntest könnten könntet",
+    "müssen": "muss musst müsst musste musstest mussten musstet gemusst müsste müssten",
+    "dürfen": "darf darfst dürft durfte durftest durften durftet gedurft dürfte dürften",
+    "wollen": "will willst wollt wollte wolltest wollten wolltet gewollt",
+    "sollen": "soll sollst sollt sollte solltest sollten solltet gesollt",
+    "mögen": "mag magst mögt mochte mochtest mochten mochtet gemocht möchte möchtest möchten möchtet",
+}
+# Weak verbs follow the regular rules; only verbs listed here (or ending in -ieren) count as covered
+WEAK_VERBS = {
+    "antworten", "arbeiten", "atmen", "bauen", "brauchen", "danken", "dauern", "decken", "drehen", "drücken",
+    "enden", "fehlen", "feiern", "fragen", "freuen", "fühlen", "führen", "füllen",
+    "glauben", "hassen", "heiraten", "holen", "hoffen", "hören", "kämpfen", "kaufen", "kehren", "klären",
+    "klopfen", "kochen", "kosten", "lachen", "lächeln", "leben", "legen", "lehren", "lernen", "lieben", "machen",
+    "malen", "meinen", "öffnen", "packen", "parken", "planen", "putzen", "rauchen", "rechnen", "reden", "regnen",
+    "reisen", "sagen", "sammeln", "schauen", "schenken", "schicken", "schmecken", "setzen", "spielen", "spülen",
+    "stecken", "stellen", "stimmen", "suchen", "tanzen", "teilen", "träumen", "üben", "warten", "wandern",
+    "wechseln", "weinen", "wohnen", "wünschen", "zahlen", "zählen", "zeigen",
+}
+# Strong and mixed verbs: (changed du/er stem or None, preterite, past participle)
+STRONG_VERBS = {
+    "beginnen": (None, "begann", "begonnen"), "bieten": (None, "bot", "geboten"), "bitten": (None, "bat", "gebeten"),
+    "bleiben": (None, "blieb", "geblieben"), "brechen": ("brich", "brach", "gebrochen"), "brennen": (None, "brannte", "gebrannt"),
+    "bringen": (None, "brachte", "gebracht"), "denken": (None, "dachte", "gedacht"), "essen": ("iss", "aß", "gegessen"),
+    "fahren": ("fähr", "fuhr", "gefahren"), "fallen": ("fäll", "fiel", "gefallen"), "fangen": ("fäng", "fing", "gefangen"),
+    "finden": (None, "fand", "gefunden"), "fliegen": (None, "flog", "geflogen"), "fließen": (None, "floss", "geflossen"),
+    "geben": ("gib", "gab", "gegeben"), "gehen": (None, "ging", "gegangen"), "gewinnen": (None, "gewann", "gewonnen"),
+    "gießen": (None, "goss", "gegossen"), "greifen": (None, "griff", "gegriffen"), "halten": ("hält", "hielt", "gehalten"),
+    "hängen": (None, "hing", "gehangen"), "heben": (None, "hob", "gehoben"), "heißen": (None, "hieß", "geheißen"),
+    "helfen": ("hilf", "half", "geholfen"), "kennen": (None, "kannte", "gekannt"), "kommen": (None, "kam", "gekommen"),
+    "laden": ("läd", "lud", "geladen"), "lassen": ("läss", "ließ", "gelassen"), "laufen": ("läuf", "lief", "gelaufen"),
+    "leiden": (None, "litt", "gelitten"), "leihen": (None, "lieh", "geliehen"), "lesen": ("lies", "las", "gelesen"),
+    "liegen": (None, "lag", "gelegen"), "lügen": (None, "log", "gelogen"), "messen": ("miss", "maß", "gemessen"),
+    "nehmen": ("nimm", "nahm", "genommen"), "nennen": (None, "nannte", "genannt"), "raten": ("rät", "riet", "geraten"),
+    "reiten": (None, "ritt", "geritten"), "rennen": (None, "rannte", "gerannt"), "riechen": (None, "roch", "gerochen"),
+    "rufen": (None, "rief", "gerufen"), "scheinen": (None, "schien", "geschienen"), "schieben": (None, "schob", "geschoben"),
+    "schlafen": ("schläf", "schlief", "geschlafen"), "schlagen": ("schläg", "schlug", "geschlagen"),
+    "schließen": (None, "schloss", "geschlossen"), "schneiden": (None, "schnitt", "geschnitten"),
+    "schreiben": (None, "schrieb", "geschrieben"), "schreien": (None, "schrie", "geschrien"),
+    "schweigen": (None, "schwieg", "geschwiegen"), "schwimmen": (None, "schwamm", "geschwommen"),
+    "sehen": ("sieh", "sah", "gesehen"), "singen": (None, "sang", "gesungen"), "sinken": (None, "sank", "gesunken"),
+    "sitzen": (None, "saß", "gesessen"), "sprechen": ("sprich", "sprach", "gesprochen"), "springen": (None, "sprang", "gesprungen"),
+    "stehen": (None, "stand", "gestanden"), "stehlen": ("stiehl", "stahl", "gestohlen"), "steigen": (None, "stieg", "gestiegen"),
+    "sterben": ("stirb", "starb", "gestorben"), "tragen": ("träg", "trug", "getragen"), "treffen": ("triff", "traf", "getroffen"),
+    "treiben": (None, "trieb", "getrieben"), "treten": ("tritt", "trat", "getreten"), "trinken": (None, "trank", "getrunken"),
+    "vergessen": ("vergiss", "vergaß", "vergessen"), "verlieren": (None, "verlor", "verloren"), "wachsen": ("wächs", "wuchs", "gewachsen"),
+    "waschen": ("wäsch", "wusch", "gewaschen"), "werfen": ("wirf", "warf", "geworfen"), "ziehen": (None, "zog", "gezogen"),
+    "zwingen": (None, "zwang", "gezwungen"),
+}
+GERMAN_COMMON_WORDS = {
+    "ich", "du", "er", "sie", "es", "wir", "ihr", "und", "der", "die", "das", "den", "dem", "des", "ist", "nicht",
+    "ein", "eine", "einen", "mit", "zu", "auf", "für", "mein", "meine", "heute", "gern", "gerne", "im", "sehr",
+    "auch", "aber", "oder", "wie", "wo", "nach", "von", "bei", "morgen", "jeden", "mich", "mir", "dich", "dir",
+    "sich", "uns", "euch", "kein", "keine", "jetzt", "immer", "hier", "dort", "schon", "noch", "zum", "zur",
+}
+ENGLISH_COMMON_WORDS = {
+    "the", "and", "i", "you", "he", "she", "it", "we", "they", "is", "are", "to", "of", "my", "your", "a", "on",
+    "with", "every", "day", "this", "that", "for", "have", "has", "do", "does", "not", "at", "go", "like", "can",
+    "today", "tomorrow", "very", "always", "there", "what", "where", "our", "their", "be", "been",
+}  # No German homographs here: "am" (an dem) would flag German sentences as English
+
+def normalize_german(text):
+    """Lowercased German words with ß folded to ss, so spelling variants compare equal"""
+    return re.findall(r"[a-zäöüß]+", text.lower().replace("ß", "ss"))
+
+def _present_endings(stem, changed_stem=None):
+    """ich/du/er/ihr/imperative forms; changed_stem is the vowel-changed du/er stem of strong verbs"""
+    needs_e = stem.endswith(("t", "d")) or re.search(r"[^lrmnh][mn]$", stem) is not None
+    link = "e" if needs_e and changed_stem is None else ""
+    du_er_stem = changed_stem or stem
+    du_form = du_er_stem + ("t" if du_er_stem.endswith(("s", "ß", "z", "x")) else link + "st")
+    er_form = du_er_stem if changed_stem and du_er_stem.endswith("t") else du_er_stem + link + "t"
+    return {stem + "e", du_form, er_form, stem + ("e" if needs_e else "") + "t", stem, du_er_stem}
+
+def _past_forms(preterite):
+    if preterite.endswith("e"):
+        return {preterite, preterite + "st", preterite + "n", preterite + "t"}
+    return {preterite, preterite + "st", preterite + "en", preterite + "t"}
+
+def _subjunctive_forms(preterite):
+    """Subjunctive II of strong and mixed verbs: umlauted preterite plus -e endings ("kam" -> "käme", "brachte" -> "brächte")"""
+    stem = preterite[:-1] if preterite.endswith("e") else preterite
+    stem = re.sub(r"[aou](?=[^aou]*$)", lambda match: {"a": "ä", "o": "ö", "u": "ü"}[match.group()], stem)
+    return {stem + "e", stem + "est", stem + "en", stem + "et"}
+
+@lru_cache(maxsize=4096)
+def german_verb_forms(verb):
+    """Set of conjugated forms (present, past, subjunctive, imperative, participle, zu-infinitive) of a one-word
+    German infinitive, or None if neither the tables nor a known prefix composition cover it"""
+    if verb in IRREGULAR_VERB_FORMS:
+        forms = set(IRREGULAR_VERB_FORMS[verb].split()) | {verb}
+    elif verb in STRONG_VERBS:
+        changed_stem, preterite, participle = STRONG_VERBS[verb]
+        stem = verb[:-2] if verb.endswith("en") else verb[:-1]
+        forms = _present_endings(stem, changed_stem) | _past_forms(preterite) | _subjunctive_forms(preterite) | {verb, participle}
+    elif verb in WEAK_VERBS or verb.endswith("ieren"):
+        stem = verb[:-1] if verb.endswith(("eln", "ern")) or not verb.endswith("en") else verb[:-2]
+        needs_e = stem.endswith(("t", "d")) or re.search(r"[^lrmnh][mn]$", stem) is not None
+        past_stem = stem + ("e" if needs_e else "")
+        no_ge = verb.endswith("ieren")
+        forms = _present_endings(stem) | _past_forms(past_stem + "te") | {verb, ("" if no_ge else "ge") + past_stem + "t"}
+    else:
+        for prefix in SEPARABLE_PREFIXES:
+            base_forms = german_verb_forms(verb[len(prefix):]) if verb.startswith(prefix) and len(verb) - len(prefix) >= 4 else None
+            if base_forms is not None:
+                # Separable verbs appear split ("stehe ... auf") or joined ("aufstehen", "aufgestanden", "aufzustehen")
+                return base_forms | {prefix + form for form in base_forms} | {prefix + "zu" + verb[len(prefix):].replace("ß", "ss")}
+        for prefix in INSEPARABLE_PREFIXES:
+            base_forms = german_verb_forms(verb[len(prefix):]) if verb.startswith(prefix) and len(verb) - len(prefix) >= 4 else None
+            if base_forms is not None:
+                # No "ge-" in the participle ("verstanden"); the base's own "ge" ("vergehen") is kept too
+                forms = {prefix + form for form in base_forms} | {prefix + form[2:] for form in base_forms if form.startswith("ge")}
+                return frozenset(forms)
+        return None
+    return frozenset(form.replace("ß", "ss") for form in forms)
+
+def _consonant_skeleton(word):
+    return re.sub(r"[aeiouäöüy]", "", word)
+
+def _skeleton_match(words, verb):
+    """True if some word shares the consonant skeleton of the verb's stem, with or without a leading ge-"""
+    stem_skeleton = _consonant_skeleton(verb[:-2] if verb.endswith("en") else verb[:-1])
+    if not stem_skeleton:
+        return True
+    for word in words:
+        candidates = (word, word[2:]) if word.startswith("ge") else (word,)
+        if any(_consonant_skeleton(candidate).startswith(stem_skeleton) for candidate in candidates):
+            return True
+    return False
+
+def uses_german_verb(words, infinitive):
+    """True if the words use the verb, False if they clearly don't, None if the tables can't tell
+    
+    Every part of a multi-word verb ("spazieren gehen", "Rad fahren") has to appear. A part counts as missing only
+    when the tables cover it and not even its consonant skeleton shows up ("trank" shares "trnk" with "trinken").
+    """
+    words = set(words)
+    parts = [part for part in re.findall(r"[a-zäöüß]+", infinitive.lower()) if part != "sich"]
+    if not parts:
+        return None
+    verdict = True
+    for part in parts:
+        forms = german_verb_forms(part)
+        if part.replace("ß", "ss") in words or (forms is not None and forms & words):
+            continue
+        if forms is not None and not _skeleton_match(words, part.replace("ß", "ss")):
+            return False
+        verdict = None  # Not in the tables, or a plausible form they do not list
+    return verdict
+
+def precheck_german_sentence(user_sentence, target_verb):
+    """Catch empty, non-German or verb-less sentences locally; returns an evaluation dict, or None if plausible"""
+    
+    def local_evaluation(feedback):
+        return {
+            "is_grammatically_correct": False,
+            "uses_target_verb_correctly": False,
+            "overall_score": "needs_improvement",
+            "feedback": feedback,
+            "corrected_sentence": user_sentence,
+            "english_translation": "(not translated - please revise your sentence first)"
+        }
+    
+    words = normalize_german(user_sentence)
+    if not words:
+        return local_evaluation("Please write a German sentence using letters, so it can be evaluated.")
+    
+    german_hits = sum(word in GERMAN_COMMON_WORDS for word in words)
+    english_hits = sum(word in ENGLISH_COMMON_WORDS for word in words)
+    has_german_letters = re.search(r"[äöüß]", user_sentence.lower()) is not None
+    if english_hits >= 2 and english_hits > german_hits and not has_german_letters:
+        return local_evaluation("This looks like an English sentence. Try writing it in German - you can do it!")
+    
+    if uses_german_verb(words, target_verb) is False:
+        return local_evaluation(
+            f"Your sentence doesn't seem to use the verb '{target_verb}' yet. "
+            f"Try building the sentence around a conjugated form of '{target_verb}' - "
+            "the grammar will be checked once the target verb is included."
+        )
+    return None
+
+# Incremental parsing of streamed JSON replies
+class IncrementalJSONParser:
+    """Parses a streamed flat JSON object, exposing each top-level field as soon as its value is complete"""
 
-    Please provide your evaluation in the following JSON format:
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.state = "before_object"
+        self.key = None
+        self.value_start = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.fields = {}
 
-    {{
-        "is_grammatically_correct": true/false,
-        "uses_target_verb_correctly": true/false,
-        "overall_score": "excellent/good/fair/needs_improvement",
-        "feedback": "Detailed feedback about grammar, verb usage, and suggestions for improvement",
-        "corrected_sentence": "If there are errors, provide a corrected version, otherwise repeat the original",
-        "english_translation": "English translation of the student's sentence (or corrected version)"
-    }}
+    @property
+    def done(self):
+        return self.state == "done"
 
+    def feed(self, text):
+        """Consume the next chunk of the reply; returns the names of fields it completed"""
+        self.buffer += text
+        completed = []
+        while self.pos < len(self.buffer):
+            char = self.buffer[self.pos]
+            if self.state == "before_object":
+                if char == "{":
+                    self.state = "before_key"
+            elif self.state == "before_key":
+                if char == '"':
+                    self.state, self.value_start = "key", self.pos
+                elif char == "}":
+                    self.state = "done"
+            elif self.state == "key":
+                if self._string_closed(char):
+                    self.key = json.loads(self.buffer[self.value_start:self.pos + 1], strict=False)
+                    self.state = "before_colon"
+            elif self.state == "before_colon":
+                if char == ":":
+                    self.state = "before_value"
+            elif self.state == "before_value":
+                if not char.isspace():
+                    self.state, self.value_start, self.depth = "value", self.pos, 0
+                    continue  # Let the value state see its first character
+            elif self.state == "value":
+                if self._value_complete(char):
+                    end = self.pos + 1 if self.buffer[self.value_start] in "\"{[" else self.pos
+                    # strict=False: models sometimes put raw newlines inside string values
+                    self.fields[self.key] = json.loads(self.buffer[self.value_start:end], strict=False)
+                    completed.append(self.key)
+                    self.state = "after_value"
+                    if end == self.pos:
+                        continue  # The delimiter that ended a bare literal belongs to after_value
+            elif self.state == "after_value":
+                if char == ",":
+                    self.state = "before_key"
+                elif char == "}":
+                    self.state = "done"
+            self.pos += 1
+        return completed
+
+    def _string_closed(self, char):
+        if self.escaped:
+            self.escaped = False
+        elif char == "\\":
+            self.escaped = True
+        elif char == '"' and self.pos > self.value_start:
+            return True
+        return False
+
+    def _value_complete(self, char):
+        first = self.buffer[self.value_start]
+        if first == '"':
+            return self._string_closed(char)
+        if first in "{[":
+            if self.in_string:
+                self.in_string = not self._string_closed(char)
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                return self.depth == 0
+            return False
+        return char in ",}" or char.isspace()
+
+    def partial_string(self, key):
+        """Decoded text received so far for a string field that is still streaming, or None"""
+        if self.state != "value" or self.key != key or self.buffer[self.value_start] != '"':
+            return None
+        raw = self.buffer[self.value_start + 1:self.pos]
+        try:
+            return json.loads(f'"{raw}"', strict=False)
+        except json.JSONDecodeError:
+            pass
+        try:
+            # The chunk ended inside an escape sequence such as \u00e; show the text before it
+            return json.loads(f'"{raw[:raw.rfind(chr(92))]}"', strict=False)  # chr(92) is the backslash
+        except json.JSONDecodeError:
+            return None
+
+SENTENCE_EVALUATION_PROMPT = PromptTemplate(
+    "sentence_evaluation",
+    """
+    You are an experienced German language teacher. Provide constructive, encouraging feedback while being accurate about grammar and usage. Always respond with valid JSON.
+    Evaluate the German sentence a student wrote with the target verb, in the following JSON format:
+    {"is_grammatically_correct": true/false,
+    "uses_target_verb_correctly": true/false,
+    "overall_score": "excellent/good/fair/needs_improvement",
+    "feedback": "Detailed feedback about grammar, verb usage, and suggestions for improvement",
+    "corrected_sentence": "If there are errors, provide a corrected version, otherwise repeat the original",
+    "english_translation": "English translation of the student's sentence (or corrected version)"}
     Be encouraging but honest in your feedback. Point out specific grammar rules if there are mistakes.
-    Consider the difficulty level when evaluating - be more lenient with beginners.
+    Consider the student's level when evaluating - be more lenient with beginners.
+    """,
+    """
+    Student level: {difficulty_level}
+    Target verb: "{target_verb}"
+    Student's sentence: "{user_sentence}"
+    """
+)
+
+# Function to check German sentence using OpenAI
+@traced("sentence_evaluation")
+def check_german_sentence_with_openai(client, user_sentence, target_verb, difficulty_level="beginner", on_update=None):
+    """Use OpenAI to evaluate the German sentence for grammar, structure, and correctness
+    
+    With on_update the reply is streamed and on_update(parser) is called after every chunk, so the
+    caller can render fields as soon as they arrive.
     """
+    
+    # Obvious problems (empty, not German, target verb missing) are answered locally without a request
+    local_evaluation = precheck_german_sentence(user_sentence, target_verb)
+    if local_evaluation is not None:
+        record_span(cache="precheck")
+        return local_evaluation
+    
+    # Identical (after normalization) submissions for the same verb and level are graded once
+    evaluation_cache = get_evaluation_cache()
+    cache_key = EvaluationCache.make_key(user_sentence, target_verb, difficulty_level)
+    cached_evaluation = evaluation_cache.get(cache_key)
+    if cached_evaluation is not None:
+        record_span(cache="hit")
+        return cached_evaluation
+    record_span(cache="miss")
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an experienced German language teacher. Provide constructive, encouraging feedback while being accurate about grammar and usage. Always respond with valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.3  # Lower temperature for more consistent evaluation
-        )
+        on_chunk = None
+        if on_update is not None:
+            parser = IncrementalJSONParser()
+            preview_broken = False
+            
+            def on_chunk(delta):
+                # A reply the parser cannot follow only ends the live preview; parse_structured_reply
+                # still judges the whole reply and can ask for a repair
+                nonlocal preview_broken
+                if preview_broken:
+                    return
+                try:
+                    parser.feed(delta)
+                except ValueError:
+                    preview_broken = True
+                    return
+                on_update(parser)
         
-        # Parse the JSON response
-        evaluation = json.loads(response.choices[0].message.content)
+        evaluation = request_structured_json(
+            client,
+            "sentence_evaluation",
+            messages=SENTENCE_EVALUATION_PROMPT.messages(
+                difficulty_level=difficulty_level, target_verb=target_verb, user_sentence=user_sentence
+            ),
+            on_chunk=on_chunk,
+            difficulty_level=difficulty_level
+        )
+        evaluation_cache.put(cache_key, evaluation)
         return evaluation
         
     except json.JSONDecodeError as e:
@@ -116,315 +1422,1456 @@ def check_german_sentence_with_openai(client, user_sentence, target_verb, diffic
         st.error(f"Error evaluating sentence: {e}")
         return None
 
-# Function to generate pronunciation audio using OpenAI TTS
-def generate_audio_with_openai(client, text, language="de"):
-    """Generate audio pronunciation using OpenAI's TTS API"""
+TRANSLATION_CHECK_PROMPT = PromptTemplate(
+    "translation_check",
+    """
+    You are a German language teacher grading vocabulary answers. Always respond with valid JSON.
+    A student was asked for the English meaning of a German verb. Accept synonyms and minor spelling mistakes, but not a different meaning.
+    Respond in the following JSON format: {"is_correct": true/false}
+    """,
+    """
+    German verb: "{german_verb}"
+    Expected answer: "{english_translation}"
+    Student's answer: "{user_answer}"
+    """
+)
+
+# Function to double-check a borderline translation answer using OpenAI
+@traced("translation_check")
+def check_translation_with_openai(client, german_verb, english_translation, user_answer):
+    """Ask OpenAI whether the answer is an acceptable meaning of the verb; returns True/False, or None on error"""
     try:
-        response = client.audio.speech.create(
-            model="tts-1",
-            voice="onyx",  # Male voice - you can also use: echo (male), fable (male), alloy, nova, shimmer
-            input=text,
-            speed=0.75  # Slower speed for better learning (25% slower than normal)
+        verdict = request_structured_json(
+            client,
+            "translation_check",
+            messages=TRANSLATION_CHECK_PROMPT.messages(
+                german_verb=german_verb, english_translation=english_translation, user_answer=user_answer
+            )
         )
         
-        # Convert to base64 for embedding in HTML
-        audio_data = response.content
-        audio_base64 = base64.b64encode(audio_data).decode()
-        return f"data:audio/mpeg;base64,{audio_base64}"
+        return verdict["is_correct"]
         
     except Exception as e:
-        st.error(f"Error generating audio: {e}")
+        st.error(f"Error checking translation: {e}")
         return None
 
-# Function to transcribe audio using OpenAI Whisper
-def transcribe_audio_with_whisper(client, audio_file):
-    """Transcribe audio using OpenAI's Whisper API"""
+# Text-to-speech settings
+TTS_MODEL = "tts-1"
+TTS_VOICE = "onyx"  # Male voice - you can also use: echo (male), fable (male), alloy, nova, shimmer
+TTS_SPEED = 0.75  # Slower speed for better learning (25% slower than normal)
+
+# Audio cache settings
+AUDIO_CACHE_DIR = os.environ.get("AUDIO_CACHE_DIR", "audio_cache")
+AUDIO_CACHE_MEMORY_BYTES = 32 * 1024 * 1024
+AUDIO_CACHE_DISK_BYTES = int(os.environ.get("AUDIO_CACHE_DISK_MB", 512)) * 1024 * 1024
+AUDIO_STREAM_CHUNK_BYTES = 16 * 1024
+AUDIO_SHARED_TTL_SECONDS = 30 * 86400  # Clips in a shared backend expire instead of growing it forever
+
+class AudioCache:
+    """Content-addressed TTS audio cache: an in-process LRU in front of a size-bounded directory on disk"""
+
+    def __init__(self, directory=AUDIO_CACHE_DIR, memory_limit=AUDIO_CACHE_MEMORY_BYTES, disk_limit=AUDIO_CACHE_DISK_BYTES, backend=None):
+        self.directory = directory
+        self.backend = backend if backend is not None and backend.shared else None  # Third level shared with other workers
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.disk_bytes = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    @staticmethod
+    def make_key(text, voice=TTS_VOICE, speed=TTS_SPEED, model=TTS_MODEL):
+        """Hash of everything that changes the synthesized audio"""
+        return hashlib.sha256(json.dumps([text, voice, speed, model]).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get(self, key):
+        """Return cached audio bytes or None, promoting disk hits into memory"""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+        try:
+            with open(self._path(key), "rb") as audio_file:
+                audio_data = audio_file.read()
+            os.utime(self._path(key))  # Mark as recently used for disk eviction
+        except OSError:
+            audio_data = self.backend.get("audio", key) if self.backend else None
+            if audio_data is None:
+                with self.lock:
+                    self.misses += 1
+                return None
+            self._write_disk(key, audio_data)
+        with self.lock:
+            self.hits += 1
+            self._remember(key, audio_data)
+        return audio_data
+
+    def contains(self, key):
+        """Whether the clip is cached, without loading it or counting a lookup"""
+        with self.lock:
+            if key in self.memory:
+                return True
+        if os.path.exists(self._path(key)):
+            return True
+        return self.backend is not None and self.backend.get("audio", key) is not None
+
+    def put(self, key, audio_data):
+        """Store audio bytes in memory and on disk, evicting least recently used entries"""
+        with self.lock:
+            self._remember(key, audio_data)
+        if self.backend:
+            self.backend.set("audio", key, audio_data, AUDIO_SHARED_TTL_SECONDS)
+        self._write_disk(key, audio_data)
+
+    def _write_disk(self, key, audio_data):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as audio_file:
+            audio_file.write(audio_data)
+        os.replace(temp_path, path)
+        with self.lock:
+            self.disk_bytes += len(audio_data)
+            if self.disk_bytes > self.disk_limit:
+                self._evict_disk()
+
+    def _remember(self, key, audio_data):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return
+        self.memory[key] = audio_data
+        self.memory_bytes += len(audio_data)
+        while self.memory_bytes > self.memory_limit and len(self.memory) > 1:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_file() and entry.name.endswith(".mp3")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries:
+            if self.disk_bytes <= self.disk_limit * 0.9:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self.disk_bytes -= size
+
+    def stats(self):
+        """Hit rate and bytes stored in each tier"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory_bytes,
+                "disk_bytes": self.disk_bytes,
+            }
+
+@st.cache_resource
+def get_audio_cache():
+    """Single audio cache shared across reruns and sessions"""
+    return AudioCache(backend=get_shared_backend())
+
+def download_speech(client, text, key):
+    """One tts-1 request, read in chunks as it is synthesized and stored in the audio cache"""
+    chunks = []
+    with client.audio.speech.with_streaming_response.create(
+        model=TTS_MODEL,
+        voice=TTS_VOICE,
+        input=text,
+        speed=TTS_SPEED
+    ) as response:
+        for chunk in response.iter_bytes(chunk_size=AUDIO_STREAM_CHUNK_BYTES):
+            chunks.append(chunk)
+    audio_data = b"".join(chunks)
+    get_audio_cache().put(key, audio_data)
+    return audio_data
+
+# Function to synthesize speech with OpenAI TTS, going through the shared audio cache
+@traced("tts")
+def synthesize_speech(client, text):
+    """Return MP3 bytes for the text, calling tts-1 only on a cache miss (raises on failure)"""
+    audio_cache = get_audio_cache()
+    key = AudioCache.make_key(text)
+    audio_data = audio_cache.get(key)
+    if audio_data is None:
+        # Concurrent requests for the same clip share one download
+        audio_data = get_api_scheduler().call("speech", download_speech, client, text, key, coalesce_key=key)
+        record_span(cache="miss")
+    else:
+        record_span(cache="hit")
+    record_span(audio_bytes=len(audio_data))
+    return audio_data
+
+# Function to generate pronunciation audio using OpenAI TTS
+def generate_audio_with_openai(client, text, language="de"):
+    """Generate audio pronunciation using OpenAI's TTS API and return the raw MP3 bytes"""
     try:
-        # Reset file pointer to beginning
-        audio_file.seek(0)
+        # Wait for a speculative or prefetch job already working on this clip; a queued one is not worth waiting for
+        background_job = get_background_tasks().join(("tts", AudioCache.make_key(text)))
+        if background_job is not None:
+            return background_job.result()
+        return synthesize_speech(client, text)
         
-        transcript = client.audio.transcriptions.create(
+    except Exception as e:
+        st.error(f"Error generating audio: {e}")
+        return None
+
+# Function to play a clip that session state refers to by its audio cache key
+def play_cached_audio(audio_ref):
+    """Render the cached clip with st.audio; returns False if it has been evicted"""
+    audio_data = get_audio_cache().get(audio_ref)
+    if audio_data is None:
+        return False
+    st.audio(audio_data, format='audio/mp3')
+    return True
+
+# Audio preprocessing before the Whisper upload
+WHISPER_SAMPLE_RATE = 16000
+SILENCE_FRAME_SECONDS = 0.02
+SILENCE_GATE_RATIO = 0.05  # Frames quieter than 5% of the loudest frame's RMS count as silence
+SILENCE_PADDING_SECONDS = 0.15
+
+def trim_silence(samples, sample_rate):
+    """Energy-gate VAD: drop leading and trailing frames whose RMS is far below the loudest frame"""
+    frame_length = max(1, int(sample_rate * SILENCE_FRAME_SECONDS))
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return samples
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    voiced = np.nonzero(rms >= max(rms.max() * SILENCE_GATE_RATIO, 1e-4))[0]
+    if len(voiced) == 0:
+        return samples
+    padding = int(sample_rate * SILENCE_PADDING_SECONDS)
+    start = max(0, voiced[0] * frame_length - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame_length + padding)
+    return samples[start:end]
+
+def _preprocess_wav(audio_bytes):
+    """Decode PCM WAV, downmix to mono, resample to 16 kHz, trim silence and re-encode as 16-bit WAV"""
+    with wave.open(BytesIO(audio_bytes)) as wav_file:
+        channels = wav_file.getnchannels()
+        sample_width = wav_file.getsampwidth()
+        sample_rate = wav_file.getframerate()
+        raw = wav_file.readframes(wav_file.getnframes())
+    
+    if sample_width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif sample_width == 3:
+        padded = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        samples = (padded[:, 0].astype(np.int32) | (padded[:, 1].astype(np.int32) << 8) | (padded[:, 2].astype(np.int8).astype(np.int32) << 16)) / 8388608
+    elif sample_width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        return None
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    
+    if sample_rate != WHISPER_SAMPLE_RATE:
+        ratio = sample_rate / WHISPER_SAMPLE_RATE
+        if ratio > 1:
+            # Box low-pass before decimating to limit aliasing
+            width = int(round(ratio))
+            samples = np.convolve(samples, np.ones(width) / width, mode="same")
+        target_length = int(len(samples) / ratio)
+        samples = np.interp(np.arange(target_length) * ratio, np.arange(len(samples)), samples)
+    samples = trim_silence(samples.astype(np.float32), WHISPER_SAMPLE_RATE)
+    
+    output = BytesIO()
+    with wave.open(output, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(WHISPER_SAMPLE_RATE)
+        wav_file.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+    return output.getvalue()
+
+def _preprocess_with_ffmpeg(audio_bytes):
+    """Use a local ffmpeg to downmix, resample, trim silence at both ends and encode as Opus"""
+    silence_filter = "silenceremove=start_periods=1:start_threshold=-45dB:start_silence=0.15"
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+         "-ac", "1", "-ar", str(WHISPER_SAMPLE_RATE),
+         "-af", f"{silence_filter},areverse,{silence_filter},areverse",
+         "-c:a", "libopus", "-b:a", "24k", "-f", "ogg", "pipe:1"],
+        input=audio_bytes, capture_output=True, timeout=60
+    )
+    return result.stdout if result.returncode == 0 and result.stdout else None
+
+def preprocess_audio_for_whisper(audio_file):
+    """Shrink an uploaded recording before transcription; returns (file-like object, stats dict)"""
+    audio_file.seek(0)
+    original = audio_file.read()
+    name = getattr(audio_file, "name", "recording.wav")
+    start = time.perf_counter()
+    
+    processed, processed_name = None, name
+    try:
+        if shutil.which("ffmpeg"):
+            processed, processed_name = _preprocess_with_ffmpeg(original), "recording.ogg"
+        elif name.lower().endswith(".wav"):
+            processed, processed_name = _preprocess_wav(original), "recording.wav"
+    except Exception:
+        processed = None  # Undecodable input is uploaded as-is; Whisper will report real problems
+    if not processed or len(processed) >= len(original):
+        processed, processed_name = original, name
+    
+    prepared = BytesIO(processed)
+    prepared.name = processed_name
+    stats = {
+        "original_bytes": len(original),
+        "processed_bytes": len(processed),
+        "bytes_saved": len(original) - len(processed),
+        "preprocess_seconds": time.perf_counter() - start,
+    }
+    return prepared, stats
+
+# Function to transcribe audio using OpenAI Whisper
+@traced("transcription")
+def request_transcription(client, audio_file):
+    """Transcribe German audio with Whisper and return the text (raises on failure)"""
+    # Reset file pointer to beginning
+    audio_file.seek(0, os.SEEK_END)
+    record_span(audio_bytes=audio_file.tell())
+    
+    def transcribe():
+        audio_file.seek(0)  # Again on every retry
+        return client.audio.transcriptions.create(
             model="whisper-1",
             file=audio_file,
             language="de"  # German language
         )
-        
-        return transcript.text
+    
+    transcript = get_api_scheduler().call("transcription", transcribe)
+    return transcript.text
+
+def transcribe_audio_with_whisper(client, audio_file):
+    """Transcribe audio using OpenAI's Whisper API"""
+    try:
+        return request_transcription(client, audio_file)
         
     except Exception as e:
         st.error(f"Error transcribing audio: {e}")
         return None
 
-# Function to analyze pronunciation using OpenAI
-def analyze_pronunciation_with_openai(client, target_sentence, user_transcription, difficulty_level="beginner"):
-    """Use OpenAI to analyze pronunciation accuracy based on transcription"""
+# Local pronunciation scoring: word alignment between the target sentence and the Whisper transcription
+UMLAUT_SPELLINGS = {"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"}
+WORD_MATCH_THRESHOLD = 0.8  # Similarity at which a transcribed word counts as the target word
+
+def normalize_spoken_word(word):
+    """Lowercase, spell umlauts and ß out and drop punctuation, so 'Grüße' and 'gruesse' compare equal"""
+    word = word.lower()
+    for letter, spelling in UMLAUT_SPELLINGS.items():
+        word = word.replace(letter, spelling)
+    return re.sub(r"[^a-z0-9]", "", word)
+
+def word_similarity(a, b):
+    if a == b:
+        return 1.0
+    return 1 - levenshtein(a, b) / max(len(a), len(b))
+
+def align_words(target_words, spoken_words):
+    """Needleman-Wunsch alignment of two word lists; returns (target index or None, spoken index or None) pairs"""
+    rows, cols = len(target_words), len(spoken_words)
+    # cost[i][j]: cheapest alignment of the first i target words with the first j spoken words
+    cost = [[0.0] * (cols + 1) for _ in range(rows + 1)]
+    for i in range(1, rows + 1):
+        cost[i][0] = float(i)
+    for j in range(1, cols + 1):
+        cost[0][j] = float(j)
+    substitution = [[1 - word_similarity(target, spoken) for spoken in spoken_words] for target in target_words]
+    for i in range(1, rows + 1):
+        for j in range(1, cols + 1):
+            cost[i][j] = min(cost[i - 1][j - 1] + substitution[i - 1][j - 1], cost[i - 1][j] + 1, cost[i][j - 1] + 1)
+    
+    pairs = []
+    i, j = rows, cols
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and cost[i][j] == cost[i - 1][j - 1] + substitution[i - 1][j - 1]:
+            pairs.append((i - 1, j - 1))
+            i, j = i - 1, j - 1
+        elif i > 0 and cost[i][j] == cost[i - 1][j] + 1:
+            pairs.append((i - 1, None))
+            i -= 1
+        else:
+            pairs.append((None, j - 1))
+            j -= 1
+    pairs.reverse()
+    return pairs
+
+def score_pronunciation_locally(target_sentence, user_transcription):
+    """Fill accuracy_percentage, words_correct, words_incorrect and pronunciation_score from a word alignment"""
+    target_display = target_sentence.split()
+    target_words = [normalize_spoken_word(word) for word in target_display]
+    spoken_words = [normalize_spoken_word(word) for word in user_transcription.split()]
+    kept = [index for index, word in enumerate(target_words) if word]
+    target_display = [target_display[index].strip(".,!?;:\"'") for index in kept]
+    target_words = [target_words[index] for index in kept]
+    spoken_words = [word for word in spoken_words if word]
+    
+    words_correct, words_incorrect = [], []
+    matched = 0
+    for target_index, spoken_index in align_words(target_words, spoken_words):
+        if target_index is None:
+            continue  # Extra spoken word; penalized through the accuracy denominator below
+        if spoken_index is not None and word_similarity(target_words[target_index], spoken_words[spoken_index]) >= WORD_MATCH_THRESHOLD:
+            matched += 1
+            words_correct.append(target_display[target_index])
+        else:
+            words_incorrect.append(target_display[target_index])
     
-    prompt = f"""
-    As a German pronunciation teacher, please analyze this pronunciation attempt by a {difficulty_level} level student:
+    accuracy = round(100 * matched / max(len(target_words), len(spoken_words), 1))
+    if accuracy >= 90:
+        pronunciation_score = "excellent"
+    elif accuracy >= 75:
+        pronunciation_score = "good"
+    elif accuracy >= 50:
+        pronunciation_score = "fair"
+    else:
+        pronunciation_score = "needs_improvement"
+    return {
+        "pronunciation_score": pronunciation_score,
+        "accuracy_percentage": accuracy,
+        "words_correct": words_correct,
+        "words_incorrect": words_incorrect,
+    }
 
+PRONUNCIATION_FEEDBACK_PROMPT = PromptTemplate(
+    "pronunciation_feedback",
+    """
+    You are an experienced German pronunciation teacher. Provide constructive, encouraging feedback while being accurate about pronunciation. Always respond with valid JSON.
+    Give feedback on a student's attempt to say the target sentence, using the transcription of what they said, the words that did not come through correctly and the word accuracy.
+    Respond in the following JSON format:
+    {"specific_feedback": "Detailed feedback about specific pronunciation issues",
+    "suggestions": "Specific suggestions for improvement",
+    "overall_feedback": "Encouraging overall assessment"}
+    Focus on common German pronunciation challenges in the words that did not come through.
+    Encourage the student while providing constructive feedback, and consider their level.
+    """,
+    """
+    Student level: {difficulty_level}
     Target sentence: "{target_sentence}"
     What the student said (transcribed): "{user_transcription}"
-
-    Please provide your analysis in the following JSON format:
-
-    {{
-        "pronunciation_score": "excellent/good/fair/needs_improvement",
-        "accuracy_percentage": 85,
-        "words_correct": ["word1", "word2"],
-        "words_incorrect": ["word3", "word4"],
-        "specific_feedback": "Detailed feedback about specific pronunciation issues",
-        "suggestions": "Specific suggestions for improvement",
-        "overall_feedback": "Encouraging overall assessment"
-    }}
-
-    Focus on:
-    1. How closely the transcription matches the target
-    2. Common German pronunciation challenges
-    3. Encourage the student while providing constructive feedback
-    4. Consider the difficulty level when evaluating
+    Words that did not come through correctly: {words_incorrect}
+    Word accuracy: {accuracy_percentage}%
     """
+)
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an experienced German pronunciation teacher. Provide constructive, encouraging feedback while being accurate about pronunciation. Always respond with valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.3
-        )
+# Function to analyze pronunciation using OpenAI
+@traced("pronunciation_analysis")
+def analyze_pronunciation_with_openai(client, target_sentence, user_transcription, difficulty_level="beginner"):
+    """Score pronunciation locally from the transcription and use OpenAI only for the written feedback"""
+    
+    analysis = score_pronunciation_locally(target_sentence, user_transcription)
+
+    try:
+        feedback = request_structured_json(
+            client,
+            "pronunciation_feedback",
+            messages=PRONUNCIATION_FEEDBACK_PROMPT.messages(
+                difficulty_level=difficulty_level,
+                target_sentence=target_sentence,
+                user_transcription=user_transcription,
+                words_incorrect=json.dumps(analysis["words_incorrect"], ensure_ascii=False),
+                accuracy_percentage=analysis["accuracy_percentage"]
+            ),
+            difficulty_level=difficulty_level
+        )
         
-        # Parse the JSON response
-        analysis = json.loads(response.choices[0].message.content)
+        for field in RESPONSE_SCHEMAS["pronunciation_feedback"]:
+            analysis[field] = feedback[field]
         return analysis
         
     except json.JSONDecodeError as e:
         st.error(f"Error parsing pronunciation analysis: {e}")
-        return None
     except Exception as e:
         st.error(f"Error analyzing pronunciation: {e}")
-        return None
+    
+    # The scores are still valid without the written feedback
+    analysis["overall_feedback"] = f"You matched {analysis['accuracy_percentage']}% of the words. Keep practicing!"
+    return analysis
 
-# Initialize session state
-def init_session_state():
-    if "current_verb_data" not in st.session_state:
-        st.session_state.current_verb_data = None
-    if "user_translation" not in st.session_state:
-        st.session_state.user_translation = ""
-    if "user_sentence" not in st.session_state:
-        st.session_state.user_sentence = ""
-    if "translation_submitted" not in st.session_state:
-        st.session_state.translation_submitted = False
-    if "sentence_submitted" not in st.session_state:
-        st.session_state.sentence_submitted = False
-    if "sentence_evaluation" not in st.session_state:
-        st.session_state.sentence_evaluation = None
-    if "show_audio_buttons" not in st.session_state:
-        st.session_state.show_audio_buttons = False
-    if "correct_count" not in st.session_state:
-        st.session_state.correct_count = 0
-    if "wrong_count" not in st.session_state:
-        st.session_state.wrong_count = 0
-    if "total_count" not in st.session_state:
-        st.session_state.total_count = 0
-    if "difficulty_level" not in st.session_state:
-        st.session_state.difficulty_level = "beginner"
-    if "loading" not in st.session_state:
-        st.session_state.loading = False
-    # New session state variables to track audio generation and pronunciation
-    if "user_audio_generated" not in st.session_state:
-        st.session_state.user_audio_generated = False
-    if "corrected_audio_generated" not in st.session_state:
-        st.session_state.corrected_audio_generated = False
-    if "current_user_audio" not in st.session_state:
-        st.session_state.current_user_audio = None
-    if "current_corrected_audio" not in st.session_state:
-        st.session_state.current_corrected_audio = None
-    if "pronunciation_mode" not in st.session_state:
-        st.session_state.pronunciation_mode = False
-    if "target_pronunciation_sentence" not in st.session_state:
-        st.session_state.target_pronunciation_sentence = ""
-    if "pronunciation_analysis" not in st.session_state:
-        st.session_state.pronunciation_analysis = None
-    if "show_recording_interface" not in st.session_state:
-        st.session_state.show_recording_interface = False
-
-# Function to reset for new verb
-def reset_for_new_verb():
-    """Reset session state for a new verb while preserving scores"""
-    keys_to_reset = [
-        'current_verb_data', 'user_translation', 'user_sentence', 
-        'translation_submitted', 'sentence_submitted', 'sentence_evaluation',
-        'show_audio_buttons', 'user_audio_generated', 'corrected_audio_generated',
-        'current_user_audio', 'current_corrected_audio', 'pronunciation_mode',
-        'target_pronunciation_sentence', 'pronunciation_analysis', 'show_recording_interface'
-    ]
-    for key in keys_to_reset:
-        if key in st.session_state:
-            del st.session_state[key]
+# Local translation grading
+TRANSLATION_LLM_FALLBACK = True  # Ask the model only when the local grader finds the answer ambiguous
+ENGLISH_FILLER_WORDS = {"to", "a", "an", "the", "something", "someone", "somebody", "sth", "sb", "oneself"}
+ENGLISH_SYNONYM_GROUPS = [
+    {"begin", "start", "commence"}, {"finish", "end", "complete"}, {"stop", "cease", "quit"},
+    {"speak", "talk"}, {"say", "tell"}, {"talk", "chat"}, {"look", "watch"}, {"see", "view"},
+    {"buy", "purchase"}, {"get", "receive", "obtain"}, {"help", "assist", "aid"}, {"try", "attempt"},
+    {"answer", "reply", "respond"}, {"ask", "inquire", "enquire"}, {"choose", "select", "pick"},
+    {"close", "shut"}, {"fix", "repair", "mend"}, {"build", "construct"}, {"understand", "comprehend"},
+    {"live", "reside", "dwell"}, {"stay", "remain"}, {"wait", "await"}, {"travel", "journey"},
+    {"hurry", "rush"}, {"shout", "yell", "scream"}, {"hide", "conceal"}, {"show", "display"},
+    {"explain", "clarify"}, {"rest", "relax"}, {"sleep", "slumber"}, {"need", "require"},
+    {"want", "wish", "desire"}, {"like", "enjoy"}, {"love", "adore"}, {"meet", "encounter"},
+    {"leave", "depart", "exit"}, {"drive", "ride"}, {"carry", "bear"}, {"put", "place", "set", "lay"},
+    {"happen", "occur"}, {"seem", "appear"}, {"think", "reckon"}, {"believe", "think"},
+    {"learn", "study"}, {"teach", "instruct"}, {"cry", "weep"}, {"throw", "toss"}, {"lift", "raise"},
+    {"smell", "sniff"}, {"cut", "chop"}, {"talk", "converse"}, {"use", "utilize", "utilise"},
+]
 
-# Main app
-def main():
-    st.set_page_config(
-        page_title="AI-Powered German Verb Practice", 
-        page_icon="🇩🇪", 
-        layout="centered",
-        initial_sidebar_state="expanded"
-    )
+def levenshtein(a, b):
+    """Edit distance between two strings or two sequences of words"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, item_a in enumerate(a, 1):
+        current = [i]
+        for j, item_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (item_a != item_b)))
+        previous = current
+    return previous[-1]
+
+def english_stem(word):
+    """Crude English stemmer so that 'goes', 'going' and 'go' compare equal"""
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("s", "")):
+        if suffix == "ed" and (len(word) <= 4 or word.endswith("eed")):
+            continue  # Base verbs ending in -ed: need, feed, shed, speed
+        if word.endswith(suffix) and len(word) - len(suffix) >= 2 and not word.endswith("ss"):
+            word = word[:-len(suffix)] + replacement
+            break
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiouls":
+        word = word[:-1]  # running -> run, stopped -> stop
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]  # make / making / makes -> mak
+    return word
+
+def english_tokens(text):
+    """Stemmed content words of an English answer, without the infinitive 'to' and filler words"""
+    words = re.findall(r"[a-z']+", text.lower())
+    return [english_stem(word) for word in words if word not in ENGLISH_FILLER_WORDS]
+
+# Stem -> stems of all synonyms, built once at import
+ENGLISH_SYNONYM_INDEX = {}
+for synonym_group in ENGLISH_SYNONYM_GROUPS:
+    group_stems = {english_stem(word) for word in synonym_group}
+    for stem in group_stems:
+        ENGLISH_SYNONYM_INDEX.setdefault(stem, set()).update(group_stems)
+
+@lru_cache(maxsize=4096)
+def build_translation_index(english_translation):
+    """All accepted answers for a verb's translation as frozensets of stems, with synonyms expanded"""
+    without_brackets = re.sub(r"\([^)]*\)", " ", english_translation)
+    with_brackets = english_translation.replace("(", " ").replace(")", " ")
+    alternatives = set()
+    for variant in (without_brackets, with_brackets):
+        alternatives.update(re.split(r"[,;/]|\bor\b", variant.lower()))
     
-    # Custom CSS
-    st.markdown("""
-        <style>
-            .header {
-                background: linear-gradient(135deg, #6a11cb 0%, #2575fc 100%);
-                color: white;
-                border-radius: 10px;
-                padding: 15px;
-                margin-bottom: 20px;
-                text-align: center;
-                box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-            }
-            .score-card {
-                display: flex;
-                justify-content: space-around;
-                margin-bottom: 20px;
-            }
-            .score-item {
-                text-align: center;
-                padding: 10px;
-                border-radius: 8px;
-                width: 30%;
-                background-color: white;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }
-            .correct { color: #2ecc71; font-weight: bold; }
-            .wrong { color: #e74c3c; font-weight: bold; }
-            .total { color: #3498db; font-weight: bold; }
-            .verb-card {
-                background-color: white;
-                border-radius: 15px;
-                padding: 25px;
-                margin: 20px 0;
-                box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-            }
-            .evaluation-card {
-                background-color: #f8f9fa;
-                border-radius: 10px;
-                padding: 20px;
-                margin: 15px 0;
-                border-left: 4px solid #3498db;
-            }
-            .excellent { border-left-color: #2ecc71 !important; }
-            .good { border-left-color: #f39c12 !important; }
-            .fair { border-left-color: #e67e22 !important; }
-            .needs_improvement { border-left-color: #e74c3c !important; }
-            .stTextInput>div>div>input {
-                border-radius: 20px !important;
-                padding: 12px 20px !important;
-                border: 2px solid #3498db !important;
-            }
-            .stTextArea>div>div>textarea {
-                border-radius: 15px !important;
-                padding: 15px !important;
-                border: 2px solid #3498db !important;
-            }
-            div.stButton > button:first-child {
-                background: linear-gradient(135deg, #3498db 0%, #1a5276 100%);
-                color: white;
-                border: none;
-                border-radius: 25px;
-                padding: 10px 25px;
-                font-weight: bold;
-                transition: all 0.3s ease;
-            }
-            div.stButton > button:first-child:hover {
-                background: linear-gradient(135deg, #2980b9 0%, #154360 100%);
-                transform: translateY(-2px);
-                box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-            }
-            .loading {
-                text-align: center;
-                color: #3498db;
-                font-size: 18px;
-                margin: 20px 0;
-            }
-        </style>
-    """, unsafe_allow_html=True)
+    phrases = set()
+    for alternative in alternatives:
+        tokens = english_tokens(alternative)
+        if not tokens:
+            continue
+        phrases.add(frozenset(tokens))
+        for position, token in enumerate(tokens):
+            for synonym in ENGLISH_SYNONYM_INDEX.get(token, ()):
+                phrases.add(frozenset(tokens[:position] + [synonym] + tokens[position + 1:]))
+    return tuple(phrases)
+
+TYPO_AUTO_PASS_MIN_LENGTH = 7  # Stemmed answers shorter than this never pass on a typo alone
+
+def grade_translation(user_answer, english_translation):
+    """Grade an English answer locally: returns 'correct', 'incorrect' or 'ambiguous'"""
+    tokens = english_tokens(user_answer)
+    if not tokens:
+        return "incorrect"
+    phrases = build_translation_index(english_translation)
+    user_phrase = frozenset(tokens)
+    if user_phrase in phrases:
+        return "correct"
     
-    init_session_state()
+    # Fuzzy match to tolerate typos: roughly one edit per four letters counts as the same word, but only for
+    # longer answers; short near-misses are often different words (thank/think, carry/marry) and go to the AI
+    user_text = " ".join(sorted(user_phrase))
+    best_ratio = 0.0
+    best_overlap = 0.0
+    for phrase in phrases:
+        phrase_text = " ".join(sorted(phrase))
+        distance = levenshtein(user_text, phrase_text)
+        longest = max(len(user_text), len(phrase_text))
+        if longest >= TYPO_AUTO_PASS_MIN_LENGTH and distance <= (longest - 1) // 4:
+            return "correct"
+        best_ratio = max(best_ratio, 1 - distance / longest)
+        best_overlap = max(best_overlap, len(user_phrase & phrase) / len(user_phrase | phrase))
+    if best_ratio >= 0.6 or best_overlap >= 0.5:
+        return "ambiguous"
+    return "incorrect"
+
+# Verb prefetch pool
+DIFFICULTY_LEVELS = ["beginner", "intermediate", "advanced"]
+VERB_POOL_SIZE = 3  # Ready verbs kept warm per difficulty level
+VERB_REFILL_MAX_ROUNDS = 3  # Batch requests per refill before giving up on reaching the limit
+
+class VerbPrefetchPool:
+    """Keeps a few ready verbs per difficulty level, refilled in batches by a background thread
     
-    # Sidebar for settings
-    with st.sidebar:
-        st.header("⚙️ Settings")
-        
-        # Difficulty level selection
-        difficulty = st.selectbox(
-            "Select Difficulty Level:",
-            ["beginner", "intermediate", "advanced"],
-            index=["beginner", "intermediate", "advanced"].index(st.session_state.difficulty_level)
-        )
-        st.session_state.difficulty_level = difficulty
+    Pooled verbs only reach the corpus once they are served, so the corpus never shadows the pool.
+    """
+
+    def __init__(self, target_size=VERB_POOL_SIZE, batch_size=VERB_BATCH_SIZE, backend=None):
+        self.target_size = target_size
+        self.batch_size = batch_size
+        self.backend = backend if backend is not None else MemoryBackend()  # Ready verbs live here, per level
+        self.lock = threading.Lock()
+        self.refilling = set()
+        self.client = None
+        self.hits = 0
+        self.misses = 0
+        self.refill_errors = 0
+        self.refill_latencies = deque(maxlen=50)
+
+    def get(self, client, difficulty_level, exclude_lemmas=()):
+        """Pop a ready verb for the level (None on a miss) and start topping the pool back up
         
-        st.markdown("---")
-        st.markdown("### 🔑 API Setup")
-        st.markdown("You need an OpenAI API key to use this app.")
-        st.markdown("[Get your API key here](https://platform.openai.com/api-keys)")
+        Verbs in exclude_lemmas are put back for other sessions instead of being thrown away, but at most
+        target_size of them: beyond that the oldest are evicted, so seen verbs can never fill the pool for good.
+        """
+        exclude_lemmas = {lemma.lower() for lemma in exclude_lemmas}
+        verb_data = None
+        skipped = []
+        for _ in range(self.backend.length("verb_pool", difficulty_level)):
+            queued = self.backend.pop("verb_pool", difficulty_level)
+            if queued is None:
+                break
+            if json.loads(queued)["german_verb"].lower() in exclude_lemmas:
+                skipped.append(queued)
+            else:
+                verb_data = json.loads(queued)
+                break
+        skipped = skipped[-self.target_size:]
+        for queued in skipped:
+            self.backend.push("verb_pool", difficulty_level, queued)
+        with self.lock:
+            self.client = client
+            if verb_data:
+                self.hits += 1
+            else:
+                self.misses += 1
+        # A pool full of verbs this learner has seen grows past its target so there is something new next time
+        self.refill(difficulty_level, limit=self.target_size + len(skipped))
+        return verb_data
+
+    def refill(self, difficulty_level, limit=None):
+        """Start a background refill for the level unless one is running or the pool holds limit verbs (default target_size)"""
+        limit = min(limit or self.target_size, 2 * self.target_size)
+        with self.lock:
+            if (self.client is None or difficulty_level in self.refilling
+                    or self.backend.length("verb_pool", difficulty_level) >= limit):
+                return
+            self.refilling.add(difficulty_level)
+        threading.Thread(target=self._refill_worker, args=(difficulty_level, limit), daemon=True).start()
+
+    def _refill_worker(self, difficulty_level, limit):
+        try:
+            for _ in range(VERB_REFILL_MAX_ROUNDS):
+                if self.backend.length("verb_pool", difficulty_level) >= limit:
+                    return
+                with self.lock:
+                    client = self.client
+                start = time.perf_counter()
+                try:
+                    verbs = request_verbs_batch_from_openai(client, difficulty_level, self.batch_size)
+                except Exception:
+                    # Give up quietly; the next get() will retry and the UI falls back to a live call
+                    with self.lock:
+                        self.refill_errors += 1
+                    return
+                queued_lemmas = {
+                    json.loads(queued)["german_verb"].lower() for queued in self.backend.items("verb_pool", difficulty_level)
+                }
+                added = 0
+                for verb_data in verbs:
+                    if verb_data["german_verb"].lower() not in queued_lemmas:
+                        self.backend.push("verb_pool", difficulty_level, json.dumps(verb_data))
+                        queued_lemmas.add(verb_data["german_verb"].lower())
+                        added += 1
+                with self.lock:
+                    self.refill_latencies.append(time.perf_counter() - start)
+                    if not verbs:
+                        self.refill_errors += 1
+                        return
+                if not added:
+                    return  # Only verbs already queued came back; asking again right away is unlikely to help
+        finally:
+            with self.lock:
+                self.refilling.discard(difficulty_level)
+
+    def stats(self):
+        """Snapshot of fill levels, hit/miss counts and refill latency for tuning the pool size"""
+        fill = {level: self.backend.length("verb_pool", level) for level in DIFFICULTY_LEVELS}
+        with self.lock:
+            latencies = list(self.refill_latencies)
+            requests_served = self.hits + self.misses
+            return {
+                "fill": fill,
+                "target_size": self.target_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests_served if requests_served else 0.0,
+                "refill_errors": self.refill_errors,
+                "avg_refill_seconds": sum(latencies) / len(latencies) if latencies else None,
+                "last_refill_seconds": latencies[-1] if latencies else None,
+            }
+
+# Persistent verb corpus
+VERB_CORPUS_PATH = os.environ.get("VERB_CORPUS_PATH", "verb_corpus.db")
+CORPUS_MAX_AGE_DAYS = 30  # Older verbs are not served, so the level gets refreshed from OpenAI
+
+class VerbCorpus:
+    """On-disk SQLite store of every generated verb, indexed by difficulty, category and lemma"""
+
+    def __init__(self, path=VERB_CORPUS_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # Several app processes can read while one writes
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS verbs (
+                    lemma TEXT NOT NULL,
+                    difficulty TEXT NOT NULL,
+                    category TEXT,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (difficulty, lemma)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_verbs_difficulty_category ON verbs (difficulty, category)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_verbs_lemma ON verbs (lemma)")
+
+    def add(self, difficulty_level, verbs):
+        """Store (or refresh) one verb dict or a list of them under the difficulty level"""
+        if isinstance(verbs, dict):
+            verbs = [verbs]
+        rows = [
+            (verb_data["german_verb"].lower(), difficulty_level, verb_data.get("verb_category"), json.dumps(verb_data), time.time())
+            for verb_data in verbs
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO verbs VALUES (?, ?, ?, ?, ?)", rows)
+
+    def pick(self, difficulty_level, exclude_lemmas=(), category=None):
+        """Return a random fresh verb for the level that is not in exclude_lemmas, or None if exhausted"""
+        query = "SELECT data FROM verbs WHERE difficulty = ? AND created_at >= ?"
+        params = [difficulty_level, time.time() - CORPUS_MAX_AGE_DAYS * 86400]
+        if category:
+            query += " AND category = ?"
+            params.append(category)
+        exclude_lemmas = [lemma.lower() for lemma in exclude_lemmas]
+        if exclude_lemmas:
+            query += f" AND lemma NOT IN ({', '.join('?' * len(exclude_lemmas))})"
+            params.extend(exclude_lemmas)
+        query += " ORDER BY RANDOM() LIMIT 1"
+        with self.lock:
+            row = self.conn.execute(query, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def verbs(self, difficulty_level):
+        """All fresh verb dicts stored for the level"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT data FROM verbs WHERE difficulty = ? AND created_at >= ?",
+                (difficulty_level, time.time() - CORPUS_MAX_AGE_DAYS * 86400)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def counts(self):
+        """Number of stored verbs per difficulty level"""
+        with self.lock:
+            rows = self.conn.execute("SELECT difficulty, COUNT(*) FROM verbs GROUP BY difficulty").fetchall()
+        return dict(rows)
+
+@st.cache_resource
+def get_verb_corpus():
+    """Single corpus connection shared across reruns and sessions"""
+    return VerbCorpus()
+
+@st.cache_resource
+def get_verb_pool(api_key):
+    """One prefetch pool per API key, shared across reruns and sessions"""
+    return VerbPrefetchPool(backend=get_shared_backend())
+
+# Spaced repetition (SM-2) settings
+REVIEW_STORE_PATH = os.environ.get("REVIEW_STORE_PATH", "reviews.db")
+SM2_INITIAL_EASE = 2.5
+SM2_MIN_EASE = 1.3
+RELEARN_MINUTES = 10  # A failed verb comes back within the same sitting
+SENTENCE_QUALITY = {"excellent": 5, "good": 4, "fair": 3, "needs_improvement": 2}
+
+def sm2_update(ease, interval_days, repetitions, quality):
+    """One SM-2 step for a 0-5 quality grade; returns (ease, interval_days, repetitions)"""
+    if quality < 3:
+        return max(SM2_MIN_EASE, ease - 0.2), RELEARN_MINUTES / 1440, 0
+    ease = max(SM2_MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if repetitions == 0:
+        interval_days = 1
+    elif repetitions == 1:
+        interval_days = 6
+    else:
+        interval_days = round(interval_days * ease, 2)
+    return ease, interval_days, repetitions + 1
+
+class ReviewStore:
+    """Per-learner review schedule and outcome log in SQLite; due verbs are always read from the database,
+    so several app processes sharing the file never serve a review another one already rescheduled"""
+
+    def __init__(self, path=REVIEW_STORE_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # Several app processes can read while one writes
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS reviews (
+                    learner TEXT NOT NULL,
+                    lemma TEXT NOT NULL,
+                    difficulty TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    ease REAL NOT NULL,
+                    interval_days REAL NOT NULL,
+                    repetitions INTEGER NOT NULL,
+                    due REAL NOT NULL,
+                    PRIMARY KEY (learner, lemma)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS outcomes (
+                    learner TEXT NOT NULL,
+                    lemma TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    quality INTEGER NOT NULL,
+                    ts REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_outcomes_learner ON outcomes (learner, kind)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_reviews_due ON reviews (learner, difficulty, due)")
+
+    def next_due(self, learner, difficulty_level, exclude_lemmas=()):
+        """Verb dict of the most overdue review for the level, or None if nothing is due yet"""
+        exclude_lemmas = set(exclude_lemmas)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT lemma, data FROM reviews WHERE learner = ? AND difficulty = ? AND due <= ? ORDER BY due LIMIT ?",
+                (learner, difficulty_level, time.time(), len(exclude_lemmas) + 1)
+            ).fetchall()
+        for lemma, data in rows:
+            if lemma not in exclude_lemmas:
+                return json.loads(data)
+        return None
+
+    def known_lemmas(self, learner):
+        """Lemmas the learner already has on their schedule, so they are not offered as new verbs"""
+        with self.lock:
+            rows = self.conn.execute("SELECT lemma FROM reviews WHERE learner = ?", (learner,)).fetchall()
+        return {lemma for lemma, in rows}
+
+    def due_count(self, learner):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM reviews WHERE learner = ? AND due <= ?", (learner, time.time())
+            ).fetchone()[0]
+
+    def record(self, learner, difficulty_level, verb_data, kind, quality):
+        """Log a translation or sentence outcome (quality 0-5) and reschedule the verb
+
+        The translation is the recall test and advances the SM-2 schedule; a weak sentence only pulls the
+        next review forward, so one verb is not counted as two successful reviews.
+        """
+        lemma = verb_data["german_verb"].lower()
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("INSERT INTO outcomes VALUES (?, ?, ?, ?, ?)", (learner, lemma, kind, quality, now))
+            row = self.conn.execute(
+                "SELECT ease, interval_days, repetitions, due FROM reviews WHERE learner = ? AND lemma = ?", (learner, lemma)
+            ).fetchone()
+            ease, interval_days, repetitions, due = row or (SM2_INITIAL_EASE, 0, 0, now)
+            if kind == "translation":
+                ease, interval_days, repetitions = sm2_update(ease, interval_days, repetitions, quality)
+                due = now + interval_days * 86400
+            elif quality < 3:
+                due = min(due, now + RELEARN_MINUTES * 60)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO reviews VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (learner, lemma, difficulty_level, json.dumps(verb_data), ease, interval_days, repetitions, due)
+            )
+
+    def totals(self, learner):
+        """Persistent (correct, wrong) translation counts for the learner"""
+        with self.lock:
+            correct, wrong = self.conn.execute(
+                "SELECT COALESCE(SUM(quality >= 3), 0), COALESCE(SUM(quality < 3), 0) FROM outcomes WHERE learner = ? AND kind = 'translation'",
+                (learner,)
+            ).fetchone()
+        return correct, wrong
+
+@st.cache_resource
+def get_review_store():
+    """Single review store shared across reruns and sessions"""
+    return ReviewStore()
+
+# Background task settings
+BACKGROUND_WORKERS = 8
+
+class BackgroundTasks:
+    """Shared thread pool that hands out the same future for a key while that task is still running"""
+
+    def __init__(self, max_workers=BACKGROUND_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="german2-background")
+        self.in_flight = {}
+        self.owners = {}  # key: sessions that only asked for it speculatively
+        self.pinned = set()  # Keys someone submitted without an owner; never cancelled
+        self.lock = threading.Lock()
+        self.speculative_started = 0
+        self.speculative_cancelled = 0
+
+    def submit(self, key, fn, *args, owner=None):
+        """Run fn(*args) once per key; with an owner the task is speculative and cancel_owned() may drop it"""
+        with self.lock:
+            future = self.in_flight.get(key)
+            started = future is None or future.done()
+            if started:
+                future = self.executor.submit(fn, *args)
+                self.in_flight[key] = future
+                if owner is not None:
+                    self.speculative_started += 1
+            if owner is None:
+                self.pinned.add(key)
+            else:
+                self.owners.setdefault(key, set()).add(owner)
+        if started:
+            # Outside the lock: a task that already finished runs the callback right here
+            future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def join(self, key):
+        """The future for key if it is already running (now protected from cancellation), or None
         
-        if st.button("🔄 Generate New Verb", use_container_width=True):
-            reset_for_new_verb()
-            st.rerun()
-    
-    # Initialize OpenAI client
-    client = get_openai_client()
-    if not client:
-        return
+        A job still queued behind other sessions' work is not worth waiting for: it is cancelled unless someone
+        else pinned it, and the caller makes the request itself (the API scheduler coalesces identical downloads).
+        """
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is None or future.cancelled():
+                return None
+            if future.running() or future.done():
+                self.pinned.add(key)
+                return future
+            unpinned = key not in self.pinned
+        # Outside the lock: cancelling runs the done callbacks synchronously
+        if unpinned and future.cancel():
+            with self.lock:
+                self.speculative_cancelled += 1
+        return None
+
+    def cancel_owned(self, owner):
+        """Cancel the owner's speculative tasks that have not started and that nobody else is waiting for"""
+        unwanted = []
+        with self.lock:
+            for key, owners in list(self.owners.items()):
+                if owner not in owners:
+                    continue
+                owners.discard(owner)
+                if not owners and key not in self.pinned and key in self.in_flight:
+                    unwanted.append(self.in_flight[key])
+        # Outside the lock: cancelling runs the done callbacks synchronously
+        cancelled = sum(future.cancel() for future in unwanted)
+        with self.lock:
+            self.speculative_cancelled += cancelled
+
+    def _forget(self, key, future):
+        with self.lock:
+            if self.in_flight.get(key) is future:
+                del self.in_flight[key]
+                self.owners.pop(key, None)
+                self.pinned.discard(key)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "in_flight": len(self.in_flight),
+                "speculative_started": self.speculative_started,
+                "speculative_cancelled": self.speculative_cancelled,
+            }
+
+@st.cache_resource
+def get_background_tasks():
+    """Single background pool shared across reruns and sessions"""
+    return BackgroundTasks()
+
+def prefetch_audio(client, text, owner=None):
+    """Start synthesizing the text into the audio cache in the background; returns the future"""
+    return get_background_tasks().submit(("tts", AudioCache.make_key(text)), synthesize_speech, client, text, owner=owner)
+
+def speculate_verb_audio(client, verb_data, owner):
+    """Synthesize the verb and its sample sentence before the learner asks, so Listen is usually a cache hit"""
+    audio_cache = get_audio_cache()
+    for text in (verb_data["german_verb"], verb_data["sample_sentence_german"]):
+        if not audio_cache.contains(AudioCache.make_key(text)):
+            prefetch_audio(client, text, owner=owner)
+
+def timed_call(timings, stage, fn, *args):
+    """Run fn(*args) and record its wall time in seconds under timings[stage]"""
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+# Function to run the pronunciation flow with independent stages overlapped
+def run_pronunciation_pipeline(client, target_sentence, audio_file, difficulty_level="beginner"):
+    """Transcribe while the reference audio is synthesized, then analyze; returns (transcription, analysis, timings, audio stats)"""
+    timings = {}
+    start = time.perf_counter()
     
-    # Header
-    st.markdown("""
-        <div class="header">
-            <h1>🇩🇪 AI-Powered German Verb Practice</h1>
-            <p>Learn German verbs with AI-generated content and intelligent sentence evaluation</p>
-        </div>
-    """, unsafe_allow_html=True)
+    # Reference TTS usually started when the evaluation arrived, in which case submit() returns that job and
+    # this timer never runs; otherwise the job times itself, from its own start to its own end
+    reference_timings = {}
+    get_background_tasks().submit(
+        ("tts", AudioCache.make_key(target_sentence)),
+        timed_call, reference_timings, "reference_audio", synthesize_speech, client, target_sentence,
+    )
     
-    # Score card
-    st.markdown(f"""
-        <div class="score-card">
-            <div class="score-item">
-                <div>Correct Answers</div>
-                <div class="correct">{st.session_state.correct_count}</div>
-            </div>
-            <div class="score-item">
-                <div>Wrong Answers</div>
-                <div class="wrong">{st.session_state.wrong_count}</div>
-            </div>
-            <div class="score-item">
-                <div>Total</div>
-                <div class="total">{st.session_state.total_count}</div>
-            </div>
-        </div>
-    """, unsafe_allow_html=True)
+    # Shrink the recording locally first; a smaller upload makes transcription faster
+    prepared_audio, audio_stats = timed_call(timings, "preprocessing", preprocess_audio_for_whisper, audio_file)
+    # Transcribed on this thread: queueing it on the shared executor would put it behind other sessions' TTS
+    try:
+        transcription = timed_call(timings, "transcription", request_transcription, client, prepared_audio)
+    except Exception as e:
+        st.error(f"Error transcribing audio: {e}")
+        transcription = None
     
-    # Generate verb data if not exists
-    if st.session_state.current_verb_data is None:
-        with st.spinner("🤖 Generating new German verb with AI..."):
-            verb_data = generate_verb_with_openai(client, st.session_state.difficulty_level)
-            if verb_data:
-                st.session_state.current_verb_data = verb_data
-            else:
-                st.error("Failed to generate verb data. Please try again.")
-                return
+    analysis = None
+    if transcription:
+        analysis = timed_call(
+            timings, "analysis", analyze_pronunciation_with_openai, client, target_sentence, transcription, difficulty_level
+        )
     
-    verb_data = st.session_state.current_verb_data
+    # Not waited for: the reference clip is optional here and may be queued behind other sessions' work.
+    # Its time is reported only if this pipeline started it and it has already finished
+    timings.update(reference_timings)
+    timings["total"] = time.perf_counter() - start
+    return transcription, analysis, timings, audio_stats
+
+# Function to build the evaluation card, also used for partially streamed evaluations
+def evaluation_card_html(evaluation):
+    """HTML for the score card; fields that have not arrived yet are shown as '…'"""
+    def verdict(field, good, bad):
+        if field not in evaluation:
+            return "…"
+        return good if evaluation[field] else bad
     
-    # Verb card
-    st.markdown(f"""
-        <div class="verb-card">
-            <h2 style="text-align: center; color: #2c3e50;">What does the German verb '<b>{verb_data['german_verb']}</b>' mean in English?</h2>
-            <p style="text-align: center; color: #7f8c8d;">Category: {verb_data.get('verb_category', 'General')}</p>
-    """, unsafe_allow_html=True)
+    overall_score = evaluation.get("overall_score", "")
+    return f"""
+        <div class="evaluation-card {overall_score.replace(' ', '_')}">
+            <h3>📝 AI Evaluation Results</h3>
+            <p><strong>Overall Score:</strong> {overall_score.title() or '…'}</p>
+            <p><strong>Grammar:</strong> {verdict('is_grammatically_correct', '✅ Correct', '❌ Needs improvement')}</p>
+            <p><strong>Verb Usage:</strong> {verdict('uses_target_verb_correctly', '✅ Correct', '❌ Incorrect usage')}</p>
+        </div>
+    """
+
+# Admin diagnostics
+def is_admin_view():
+    """Diagnostics are shown with ?admin=<ADMIN_TOKEN>, and never when no token is configured"""
+    try:
+        admin_token = st.secrets.get("ADMIN_TOKEN")
+    except Exception:
+        admin_token = None
+    if not admin_token:
+        return False
+    return hmac.compare_digest(st.query_params.get("admin", ""), str(admin_token))
+
+def render_admin_panel(verb_pool, verb_corpus, session):
+    """Sidebar panel with stage latencies, the verb pool, cache and parsing counters, and this session's footprint"""
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### 🛠️ Admin")
+        with st.expander("⏱️ Stage Latency", expanded=True):
+            summary = get_metrics_recorder().summary()
+            if not summary:
+                st.markdown("No traced calls yet.")
+            for stage, row in summary.items():
+                line = f"**{stage}** · {row['calls']} calls · p50 {row['p50']:.2f}s · p95 {row['p95']:.2f}s"
+                if row["tokens_in"] or row["tokens_out"]:
+                    line += f" · {row['tokens_in']:.0f}/{row['tokens_out']:.0f} tokens"
+                if row["tokens_cached"]:
+                    line += f" · {row['tokens_cached']:.0f} cached"
+                if row["audio_bytes"]:
+                    line += f" · {row['audio_bytes'] / 1024:.0f} KB"
+                if row["cache_hits"] is not None:
+                    line += f" · {row['cache_hits']:.0%} without API call"
+                if row["errors"]:
+                    line += f" · {row['errors']} errors"
+                st.markdown(line)
+        with st.expander("📊 Verb Pool"):
+            pool_stats = verb_pool.stats()
+            for level, filled in pool_stats["fill"].items():
+                st.markdown(f"**{level.title()}:** {filled}/{pool_stats['target_size']} ready")
+            st.markdown(f"**Hits / Misses:** {pool_stats['hits']} / {pool_stats['misses']} ({pool_stats['hit_rate']:.0%} hit rate)")
+            if pool_stats["avg_refill_seconds"] is not None:
+                st.markdown(f"**Refill latency:** {pool_stats['avg_refill_seconds']:.2f}s avg, {pool_stats['last_refill_seconds']:.2f}s last")
+            if pool_stats["refill_errors"]:
+                st.markdown(f"**Refill errors:** {pool_stats['refill_errors']}")
+            corpus_counts = verb_corpus.counts()
+            st.markdown("**Corpus:** " + ", ".join(f"{level} {corpus_counts.get(level, 0)}" for level in DIFFICULTY_LEVELS))
+        with st.expander("🔊 Audio Cache"):
+            audio_stats = get_audio_cache().stats()
+            background_stats = get_background_tasks().stats()
+            st.markdown(f"**Hits / Misses:** {audio_stats['hits']} / {audio_stats['misses']} ({audio_stats['hit_rate']:.0%} hit rate)")
+            st.markdown(f"**In memory:** {audio_stats['memory_entries']} clips, {audio_stats['memory_bytes'] / 1024:.0f} KB")
+            st.markdown(f"**On disk:** {audio_stats['disk_bytes'] / 1024:.0f} KB")
+            st.markdown(f"**Speculative:** {background_stats['speculative_started']} started, {background_stats['speculative_cancelled']} cancelled")
+        with st.expander("🧠 Evaluation Cache"):
+            evaluation_stats = get_evaluation_cache().stats()
+            st.markdown(f"**Hits / Misses:** {evaluation_stats['hits']} / {evaluation_stats['misses']} ({evaluation_stats['hit_rate']:.0%} hit rate)")
+            st.markdown(f"**Entries:** {evaluation_stats['entries']}")
+        with st.expander("🧾 Response Parsing"):
+            response_stats = get_response_stats().snapshot()
+            st.markdown(f"**Structured replies:** {response_stats['responses']}")
+            st.markdown(f"**Recovered from fences/prose:** {response_stats['extracted']}")
+            st.markdown(f"**Parse failures / repaired:** {response_stats['parse_failures']} / {response_stats['repairs_succeeded']}")
+            st.markdown(f"**Retries saved:** {response_stats['retries_saved']}")
+        with st.expander("🧍 Session"):
+            st.markdown(f"**Footprint:** {session.footprint() / 1024:.1f} KB")
+            st.markdown(f"**Shared backend:** {type(get_shared_backend()).__name__}")
+            field_sizes = sorted(((deep_sizeof(getattr(session, name)), name) for name in PracticeSession.__slots__), reverse=True)
+            st.markdown("**Largest fields:** " + ", ".join(f"{name} {size} B" for size, name in field_sizes[:3]))
+        with st.expander("🚦 API Scheduler"):
+            scheduler_stats = get_api_scheduler().stats()
+            st.markdown(f"**Calls / Retries:** {scheduler_stats['calls']} / {scheduler_stats['retries']} ({scheduler_stats['gave_up']} gave up)")
+            st.markdown(f"**Rate limited:** {scheduler_stats['rate_limited']} · **Coalesced:** {scheduler_stats['coalesced']}")
+            st.markdown(f"**Time queued:** {scheduler_stats['wait_seconds']:.1f}s")
+            st.markdown("**Current rate:** " + ", ".join(f"{endpoint} {rate:.1f}/s" for endpoint, rate in scheduler_stats["rates"].items()))
+        with st.expander("✂️ Prompts"):
+            tokenizer = PROMPT_TOKEN_ENCODING if get_token_encoding() is not None else f"~{PROMPT_CHARS_PER_TOKEN} chars/token estimate"
+            st.markdown(f"**Token counts:** {tokenizer}")
+            for name, template in PROMPT_TEMPLATES.items():
+                if not template.calls:
+                    st.markdown(f"**{name}** · not used yet")
+                    continue
+                st.markdown(
+                    f"**{name}** · {template.calls} calls · static prefix {template.prefix_tokens} tokens"
+                    f" · variable {template.variable_tokens / template.calls:.0f} tokens per call"
+                )
+        with st.expander("🧭 Model Routing"):
+            router_stats = get_model_router().stats()
+            st.markdown(f"**Routed:** {router_stats['routed']} · **SLO fallbacks:** {router_stats['slo_fallbacks']} · **Error fallbacks:** {router_stats['error_fallbacks']}")
+            for task, row in router_stats["tasks"].items():
+                models = ", ".join(
+                    f"{model} {'–' if p95 is None else f'{p95:.2f}s'}" for model, p95 in row["p95"].items()
+                )
+                server = f" · {row['base_url']}" if row["base_url"] else ""
+                st.markdown(f"**{task}** (SLO {row['slo_seconds']:.1f}s{server}): {models}")
+
+# Per-user session state, kept as one compact object instead of ~20 loose st.session_state keys
+def deep_sizeof(value, seen=None):
+    """Approximate retained size of an object graph in bytes"""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in value)
+    elif hasattr(value, "__slots__"):
+        size += sum(deep_sizeof(getattr(value, slot), seen) for slot in value.__slots__ if hasattr(value, slot))
+    elif hasattr(value, "__dict__"):
+        size += deep_sizeof(vars(value), seen)
+    return size
+
+class PracticeSession:
+    """Everything one learner's session needs across reruns; audio is held as audio cache keys, never as bytes"""
+
+    __slots__ = (
+        "current_verb_data", "user_translation", "user_sentence", "translation_submitted", "translation_correct", "sentence_submitted",
+        "sentence_evaluation", "show_audio_buttons", "current_user_audio", "current_corrected_audio",
+        "pronunciation_mode", "target_pronunciation_sentence", "pronunciation_analysis", "show_recording_interface",
+        "correct_count", "wrong_count", "total_count", "difficulty_level", "seen_verbs", "learner",
+    )
+
+    def __init__(self):
+        self.correct_count = 0
+        self.wrong_count = 0
+        self.total_count = 0
+        self.difficulty_level = "beginner"
+        self.seen_verbs = []  # Lemmas already shown this session, so the corpus does not repeat them
+        self.learner = ""  # Name the review store keys progress by; empty keeps scores for this session only
+        self.reset_for_new_verb()
+
+    def reset_for_new_verb(self):
+        """Clear the per-verb fields while preserving scores"""
+        self.current_verb_data = None
+        self.user_translation = ""
+        self.user_sentence = ""
+        self.translation_submitted = False
+        self.translation_correct = None
+        self.sentence_submitted = False
+        self.sentence_evaluation = None
+        self.show_audio_buttons = False
+        self.current_user_audio = None
+        self.current_corrected_audio = None
+        self.pronunciation_mode = False
+        self.target_pronunciation_sentence = ""
+        self.pronunciation_analysis = None
+        self.show_recording_interface = False
+
+    @property
+    def user_audio_generated(self):
+        return self.current_user_audio is not None
+
+    @property
+    def corrected_audio_generated(self):
+        return self.current_corrected_audio is not None
+
+    def footprint(self):
+        """Bytes retained by this session's state"""
+        return deep_sizeof(self)
+
+    def to_json(self):
+        return json.dumps({name: getattr(self, name) for name in self.__slots__})
+
+    @classmethod
+    def from_json(cls, snapshot):
+        session = cls()
+        for name, value in json.loads(snapshot).items():
+            if name in cls.__slots__:
+                setattr(session, name, value)
+        return session
+
+# Sessions are snapshotted to the shared backend under an id kept in the URL, so any worker can resume them.
+# A lease records which connection and browser use the id, so a shared link cannot take over a live session.
+SESSION_TTL_SECONDS = 7 * 86400
+SESSION_LEASE_SECONDS = float(os.environ.get("SESSION_LEASE_SECONDS", 120))  # Renewed on every run
+XSRF_COOKIE_NAME = "_streamlit_xsrf"
+
+def browser_fingerprint():
+    """Hash of the browser's XSRF token: the same across reloads, different in every other browser; None if unavailable"""
+    try:
+        cookie = st.context.cookies.get(XSRF_COOKIE_NAME)
+    except Exception:
+        return None
+    if not isinstance(cookie, str) or not cookie:
+        return None
+    parts = cookie.strip("\"'").split("|")
+    try:
+        if parts[0] == "2":
+            # 2|mask|masked_token|timestamp: the mask changes on every response, the token does not
+            mask, masked = bytes.fromhex(parts[1]), bytes.fromhex(parts[2])
+            token = bytes(byte ^ mask[index % 4] for index, byte in enumerate(masked))
+        else:
+            token = cookie.encode()
+    except (ValueError, IndexError):
+        return None
+    return hashlib.sha256(token).hexdigest()[:16]
+
+def session_held_elsewhere(session_id):
+    """True if a live connection from another browser (or an unidentifiable one) holds the session id"""
+    lease = get_shared_backend().get("session_lease", session_id)
+    if lease is None:
+        return False
+    lease = json.loads(lease)
+    if lease["connection"] == st.session_state.connection_id:
+        return False
+    browser = browser_fingerprint()
+    return browser is None or lease["browser"] != browser  # The same browser reloading may resume
+
+def renew_session_lease():
+    get_shared_backend().set(
+        "session_lease", st.session_state.practice_id,
+        json.dumps({"connection": st.session_state.connection_id, "browser": browser_fingerprint()}),
+        SESSION_LEASE_SECONDS
+    )
+
+def get_practice_session():
+    """The current user's PracticeSession: restored from the shared backend on a new connection, or created
     
+    A sid that a live connection in another browser is using is not restored; that visitor gets a new session.
+    """
+    if "practice" not in st.session_state:
+        st.session_state.connection_id = os.urandom(8).hex()
+        session_id = st.query_params.get("sid")
+        snapshot = None
+        if session_id and not session_held_elsewhere(session_id):
+            snapshot = get_shared_backend().get("session", session_id)
+        if snapshot is None:
+            session_id = os.urandom(8).hex()
+            st.session_state.practice = PracticeSession()
+        else:
+            st.session_state.practice = PracticeSession.from_json(snapshot)
+        st.session_state.practice_id = session_id
+        st.query_params["sid"] = session_id
+        renew_session_lease()
+    return st.session_state.practice
+
+def save_practice_session():
+    """Write the session snapshot back after a run (including runs cut short by st.rerun or st.stop)"""
+    if "practice" in st.session_state:
+        get_shared_backend().set(
+            "session", st.session_state.practice_id, st.session_state.practice.to_json(), SESSION_TTL_SECONDS
+        )
+        renew_session_lease()
+
+# Static page assets, built once per process instead of on every rerun
+APP_CSS = """
+    <style>
+        .header {
+            background: linear-gradient(135deg, #6a11cb 0%, #2575fc 100%);
+            color: white;
+            border-radius: 10px;
+            padding: 15px;
+            margin-bottom: 20px;
+            text-align: center;
+            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+        }
+        .score-card {
+            display: flex;
+            justify-content: space-around;
+            margin-bottom: 20px;
+        }
+        .score-item {
+            text-align: center;
+            padding: 10px;
+            border-radius: 8px;
+            width: 30%;
+            background-color: white;
+            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+        }
+        .correct { color: #2ecc71; font-weight: bold; }
+        .wrong { color: #e74c3c; font-weight: bold; }
+        .total { color: #3498db; font-weight: bold; }
+        .verb-card {
+            background-color: white;
+            border-radius: 15px;
+            padding: 25px;
+            margin: 20px 0;
+            box-shadow: 0 4px 8px rgba(0,0,0,0.1);
+        }
+        .evaluation-card {
+            background-color: #f8f9fa;
+            border-radius: 10px;
+            padding: 20px;
+            margin: 15px 0;
+            border-left: 4px solid #3498db;
+        }
+        .excellent { border-left-color: #2ecc71 !important; }
+        .good { border-left-color: #f39c12 !important; }
+        .fair { border-left-color: #e67e22 !important; }
+        .needs_improvement { border-left-color: #e74c3c !important; }
+        .stTextInput>div>div>input {
+            border-radius: 20px !important;
+            padding: 12px 20px !important;
+            border: 2px solid #3498db !important;
+        }
+        .stTextArea>div>div>textarea {
+            border-radius: 15px !important;
+            padding: 15px !important;
+            border: 2px solid #3498db !important;
+        }
+        div.stButton > button:first-child {
+            background: linear-gradient(135deg, #3498db 0%, #1a5276 100%);
+            color: white;
+            border: none;
+            border-radius: 25px;
+            padding: 10px 25px;
+            font-weight: bold;
+            transition: all 0.3s ease;
+        }
+        div.stButton > button:first-child:hover {
+            background: linear-gradient(135deg, #2980b9 0%, #154360 100%);
+            transform: translateY(-2px);
+            box-shadow: 0 4px 8px rgba(0,0,0,0.2);
+        }
+        .loading {
+            text-align: center;
+            color: #3498db;
+            font-size: 18px;
+            margin: 20px 0;
+        }
+    </style>
+"""
+APP_CSS = re.sub(r"\s*([{}:;,>])\s*", r"\1", " ".join(APP_CSS.split()))  # Minified: about half the bytes per full run
+
+HEADER_HTML = """
+    <div class="header">
+        <h1>🇩🇪 AI-Powered German Verb Practice</h1>
+        <p>Learn German verbs with AI-generated content and intelligent sentence evaluation</p>
+    </div>
+"""
+
+FOOTER_HTML = """
+    <div style="text-align: center; margin-top: 30px; color: #7f8c8d; font-size: 14px;">
+        <p>🤖 AI-Powered German verb practice with intelligent sentence evaluation</p>
+        <p>Built with Streamlit • 🇩🇪 Learn German Effectively</p>
+    </div>
+"""
+
+RECORDING_HELP = """
+    **On Mobile/Tablet:**
+    - Use your device's voice recorder app
+    - Record yourself saying the German sentence
+    - Save as an audio file and upload here
+
+    **On Computer:**
+    - Use your computer's built-in recorder (Windows Voice Recorder, macOS QuickTime, etc.)
+    - Online tools like [Online Voice Recorder](https://online-voice-recorder.com/)
+    - Record clearly and save as MP3, WAV, or M4A format
+
+    **Tips for Better Results:**
+    - Speak clearly and at normal speed
+    - Record in a quiet environment
+    - Hold the microphone/device close to your mouth
+    - Try to match the rhythm and intonation of the target audio
+"""
+
+def timed_run(stage):
+    """Decorator recording the wall time of a full or fragment run, then snapshotting the session
+
+    Runs show up as rerun_* stages in the admin latency panel. The snapshot has to happen here because a
+    fragment rerun never reaches the end of the script.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                get_metrics_recorder().record(
+                    {"stage": stage, "ts": time.time(), "ok": True, "seconds": time.perf_counter() - start}
+                )
+                save_practice_session()
+        return wrapper
+    return decorator
+
+def start_next_verb(session):
+    """Drop the current verb, cancelling its speculative audio if that has not started yet"""
+    get_background_tasks().cancel_owned(st.session_state.practice_id)
+    session.reset_for_new_verb()
+
+def practice_target(evaluation, user_sentence):
+    """The corrected sentence if the evaluation changed anything, otherwise the learner's own"""
+    return evaluation['corrected_sentence'] if evaluation['corrected_sentence'].lower() != user_sentence.lower() else user_sentence
+
+# Verb audio and translation check; reruns on its own except when a check changes the score
+@st.fragment
+@timed_run("rerun_translation")
+def translation_section(client, session, verb_data, review_store):
     # Audio buttons
     col1, col2 = st.columns([1, 1])
     with col1:
@@ -435,7 +2882,7 @@ def main():
                     st.audio(audio_data, format='audio/mp3')
                 else:
                     st.error("Could not generate audio pronunciation.")
-    
+
     with col2:
         if st.button("🗣️ Listen to Sentence", key="sentence_audio", use_container_width=True):
             with st.spinner("Generating sentence pronunciation..."):
@@ -444,329 +2891,436 @@ def main():
                     st.audio(audio_data, format='audio/mp3')
                 else:
                     st.error("Could not generate sentence audio.")
-    
+
     # Translation input
     user_translation = st.text_input(
-        "Enter the English meaning:", 
-        value=st.session_state.user_translation,
+        "Enter the English meaning:",
+        value=session.user_translation,
         key="translation_input",
         placeholder="Type the English meaning here...",
         label_visibility="collapsed"
     )
-    
+
     # Update session state with current input
-    st.session_state.user_translation = user_translation
-    
+    session.user_translation = user_translation
+
     # Check translation button
-    if st.button("Check Translation", key="check_translation", use_container_width=True):
+    # One graded outcome per verb: further clicks would re-score it and feed SM-2 repeated reviews
+    if st.button("Check Translation", key="check_translation", use_container_width=True,
+                 disabled=session.translation_submitted) and not session.translation_submitted:
         if user_translation.strip():
-            st.session_state.translation_submitted = True
-            st.session_state.total_count += 1
-            
-            # More flexible matching
-            correct_answer = verb_data["english_translation"].lower().strip()
-            user_answer = user_translation.lower().strip()
-            
-            # Check for partial matches (remove "to" for comparison)
-            correct_clean = correct_answer.replace("to ", "").strip()
-            user_clean = user_answer.replace("to ", "").strip()
-            
-            if user_clean == correct_clean or user_answer == correct_answer:
-                st.session_state.correct_count += 1
-                st.success("✅ Correct! Well done!")
+            # Grade locally (synonyms, word forms, typos) and only ask the AI about borderline answers
+            grade = grade_translation(user_translation, verb_data["english_translation"])
+            if grade == "ambiguous" and TRANSLATION_LLM_FALLBACK:
+                with st.spinner("🤖 Double-checking your answer with AI..."):
+                    is_correct = check_translation_with_openai(
+                        client, verb_data["german_verb"], verb_data["english_translation"], user_translation
+                    )
+                if is_correct is None:
+                    # The check failed, not the learner: leave the score and the review schedule alone
+                    st.warning("Your answer could not be checked right now. Please try again.")
+                    return
+                grade = "correct" if is_correct else "incorrect"
+
+            session.translation_submitted = True
+            session.total_count += 1
+            session.translation_correct = grade == "correct"
+            if session.translation_correct:
+                session.correct_count += 1
             else:
-                st.session_state.wrong_count += 1
-                st.error(f"❌ Incorrect. The correct meaning is: **{verb_data['english_translation']}**")
+                session.wrong_count += 1
+            if session.learner:
+                review_store.record(session.learner, session.difficulty_level, verb_data, "translation", 4 if grade == "correct" else 1)
+            # The score card and the sentence section live outside this fragment
+            st.rerun()
         else:
             st.warning("Please enter an English translation first!")
-    
-    # Sentence section
-    if st.session_state.translation_submitted:
-        st.markdown("---")
-        st.subheader(f"Use '{verb_data['german_verb']}' in a German sentence")
-        st.info(f"**Example:** {verb_data['sample_sentence_german']}  \n*({verb_data['sample_sentence_english']})*")
-        
-        user_sentence = st.text_area(
-            "Your German sentence:", 
-            value=st.session_state.user_sentence,
-            key="sentence_input",
-            height=100,
-            placeholder="Type your German sentence here...",
-            label_visibility="collapsed"
-        )
-        
-        # Update session state with current input
-        st.session_state.user_sentence = user_sentence
-        
-        # Check sentence button with AI evaluation
-        if st.button("🤖 Check Sentence with AI", key="check_sentence", use_container_width=True):
-            if user_sentence.strip():
-                st.session_state.sentence_submitted = True
-                
-                with st.spinner("🧠 AI is evaluating your German sentence..."):
-                    evaluation = check_german_sentence_with_openai(
-                        client, 
-                        user_sentence, 
-                        verb_data['german_verb'], 
-                        st.session_state.difficulty_level
-                    )
-                    
-                    if evaluation:
-                        st.session_state.sentence_evaluation = evaluation
-                        st.session_state.show_audio_buttons = True
-                        
-                        # Display evaluation results
-                        score_class = evaluation['overall_score'].replace(' ', '_')
-                        
+
+    if session.translation_correct:
+        st.success("✅ Correct! Well done!")
+    elif session.translation_correct is not None:
+        st.error(f"❌ Incorrect. The correct meaning is: **{verb_data['english_translation']}**")
+
+# Sentence writing and its streamed evaluation
+@st.fragment
+@timed_run("rerun_sentence")
+def sentence_section(client, session, verb_data, review_store):
+    st.markdown("---")
+    st.subheader(f"Use '{verb_data['german_verb']}' in a German sentence")
+    st.info(f"**Example:** {verb_data['sample_sentence_german']}  \n*({verb_data['sample_sentence_english']})*")
+
+    user_sentence = st.text_area(
+        "Your German sentence:",
+        value=session.user_sentence,
+        key="sentence_input",
+        height=100,
+        placeholder="Type your German sentence here...",
+        label_visibility="collapsed"
+    )
+
+    # Update session state with current input
+    session.user_sentence = user_sentence
+
+    # Check sentence button with AI evaluation
+    if st.button("🤖 Check Sentence with AI", key="check_sentence", use_container_width=True):
+        if user_sentence.strip():
+            session.sentence_submitted = True
+
+            # Placeholders are filled progressively while the evaluation streams in
+            card_slot = st.empty()
+            feedback_slot = st.empty()
+
+            def show_partial_evaluation(parser):
+                if parser.fields:
+                    card_slot.markdown(evaluation_card_html(parser.fields), unsafe_allow_html=True)
+                feedback = parser.fields.get("feedback") or parser.partial_string("feedback")
+                if feedback:
+                    feedback_slot.markdown(f"### 💡 Detailed Feedback\n\n{feedback}")
+
+            with st.spinner("🧠 AI is evaluating your German sentence..."):
+                evaluation = check_german_sentence_with_openai(
+                    client,
+                    user_sentence,
+                    verb_data['german_verb'],
+                    session.difficulty_level,
+                    on_update=show_partial_evaluation
+                )
+
+            if evaluation:
+                session.sentence_evaluation = evaluation
+                session.show_audio_buttons = True
+                if session.learner:
+                    quality = SENTENCE_QUALITY.get(evaluation["overall_score"].lower(), 3)
+                    if not evaluation["uses_target_verb_correctly"]:
+                        quality = min(quality, 2)
+                    review_store.record(session.learner, session.difficulty_level, verb_data, "sentence", quality)
+
+                # The practice target is known now, so start its reference audio in the background
+                prefetch_audio(client, practice_target(evaluation, user_sentence))
+
+                # Listen & Practice and Next Verb live outside this fragment
+                st.rerun()
+            else:
+                st.error("Could not evaluate the sentence. Please try again.")
+        else:
+            st.warning("Please enter a German sentence first!")
+
+    evaluation = session.sentence_evaluation
+    if evaluation:
+        # Display evaluation results
+        st.markdown(evaluation_card_html(evaluation), unsafe_allow_html=True)
+
+        # Detailed feedback
+        st.markdown(f"### 💡 Detailed Feedback\n\n{evaluation['feedback']}")
+
+        # Show corrected sentence if different
+        if evaluation['corrected_sentence'].lower() != session.user_sentence.lower():
+            st.markdown("### ✏️ Suggested Correction")
+            st.info(f"**Corrected:** {evaluation['corrected_sentence']}")
+
+        # Show English translation
+        st.markdown("### 🇬🇧 English Translation")
+        st.write(f"*{evaluation['english_translation']}*")
+
+# Listen & Practice buttons shown once the sentence has been evaluated
+@st.fragment
+@timed_run("rerun_listen")
+def listen_section(client, session):
+    evaluation = session.sentence_evaluation
+    user_sentence = session.user_sentence
+
+    st.markdown("### 🔊 Listen & Practice")
+    col1, col2 = st.columns([1, 1])
+
+    with col1:
+        if st.button("🔊 Hear Corrected Version", key="corrected_sentence_audio", use_container_width=True):
+            if not session.corrected_audio_generated:
+                with st.spinner("Generating pronunciation..."):
+                    sentence_to_play = practice_target(evaluation, user_sentence)
+                    audio_data = generate_audio_with_openai(client, sentence_to_play)
+                    if audio_data:
+                        session.current_corrected_audio = AudioCache.make_key(sentence_to_play)
+                    else:
+                        st.error("Could not generate audio for the sentence.")
+
+            # Display audio if available
+            if session.current_corrected_audio:
+                play_cached_audio(session.current_corrected_audio)
+
+    with col2:
+        if st.button("🎯 Practice Pronunciation", key="practice_pronunciation", use_container_width=True):
+            session.pronunciation_mode = True
+            session.show_recording_interface = True
+            # Set the target sentence (use corrected version if available)
+            target_sentence = practice_target(evaluation, user_sentence)
+            session.target_pronunciation_sentence = target_sentence
+
+            # Join the reference audio started when the evaluation arrived if it is already running;
+            # a job still queued behind other sessions is cancelled and requested directly instead
+            if not session.corrected_audio_generated:
+                with st.spinner("Preparing pronunciation practice..."):
+                    if generate_audio_with_openai(client, target_sentence) is not None:
+                        session.current_corrected_audio = AudioCache.make_key(target_sentence)
+
+            # The practice interface is its own fragment
+            st.rerun()
+
+# Pronunciation practice: upload a recording and analyze it
+@st.fragment
+@timed_run("rerun_pronunciation")
+def pronunciation_section(client, session):
+    st.markdown("---")
+    st.markdown("### 🎤 Pronunciation Practice")
+
+    # Show target sentence
+    st.info(f"**Target sentence:** {session.target_pronunciation_sentence}")
+
+    # Play target audio
+    if session.current_corrected_audio:
+        st.markdown("**🔊 Listen to the correct pronunciation:**")
+        play_cached_audio(session.current_corrected_audio)
+
+    st.markdown("**📱 Record your pronunciation:**")
+    st.markdown("""
+    1. Click the button below to start recording
+    2. Say the German sentence clearly
+    3. Upload your recording for AI analysis
+    """)
+
+    # Audio recording interface
+    uploaded_audio = st.file_uploader(
+        "Record and upload your pronunciation:",
+        type=['wav', 'mp3', 'm4a', 'ogg', 'flac'],
+        key="pronunciation_audio",
+        help="Record yourself saying the German sentence and upload the audio file"
+    )
+
+    if uploaded_audio is not None:
+        st.success("✅ Audio uploaded successfully!")
+
+        # Show audio player for user's recording
+        st.markdown("**🎧 Your recording:**")
+        st.audio(uploaded_audio, format='audio/wav')
+
+        # Analyze pronunciation button
+        if st.button("🤖 Analyze My Pronunciation", key="analyze_pronunciation", use_container_width=True):
+            with st.spinner("🧠 AI is analyzing your pronunciation..."):
+                # Transcribe, prepare the reference audio and analyze with the independent stages overlapped
+                transcription, analysis, pipeline_timings, audio_stats = run_pronunciation_pipeline(
+                    client,
+                    session.target_pronunciation_sentence,
+                    uploaded_audio,
+                    session.difficulty_level
+                )
+
+                if transcription:
+                    st.markdown("### 📝 What you said:")
+                    st.write(f"*\"{transcription}\"*")
+
+                    if analysis:
+                        session.pronunciation_analysis = analysis
+
+                        # Display pronunciation analysis
+                        score_class = analysis['pronunciation_score'].replace(' ', '_')
+
                         st.markdown(f"""
                             <div class="evaluation-card {score_class}">
-                                <h3>📝 AI Evaluation Results</h3>
-                                <p><strong>Overall Score:</strong> {evaluation['overall_score'].title()}</p>
-                                <p><strong>Grammar:</strong> {'✅ Correct' if evaluation['is_grammatically_correct'] else '❌ Needs improvement'}</p>
-                                <p><strong>Verb Usage:</strong> {'✅ Correct' if evaluation['uses_target_verb_correctly'] else '❌ Incorrect usage'}</p>
+                                <h3>🎯 Pronunciation Analysis</h3>
+                                <p><strong>Score:</strong> {analysis['pronunciation_score'].title()}</p>
+                                <p><strong>Accuracy:</strong> {analysis.get('accuracy_percentage', 'N/A')}%</p>
                             </div>
                         """, unsafe_allow_html=True)
-                        
+
                         # Detailed feedback
-                        st.markdown("### 💡 Detailed Feedback")
-                        st.write(evaluation['feedback'])
-                        
-                        # Show corrected sentence if different
-                        if evaluation['corrected_sentence'].lower() != user_sentence.lower():
-                            st.markdown("### ✏️ Suggested Correction")
-                            st.info(f"**Corrected:** {evaluation['corrected_sentence']}")
-                        
-                        # Show English translation
-                        st.markdown("### 🇬🇧 English Translation")
-                        st.write(f"*{evaluation['english_translation']}*")
+                        col1, col2 = st.columns([1, 1])
+
+                        with col1:
+                            if analysis.get('words_correct'):
+                                st.markdown("### ✅ Words Pronounced Well:")
+                                for word in analysis['words_correct']:
+                                    st.markdown(f"- {word}")
+
+                        with col2:
+                            if analysis.get('words_incorrect'):
+                                st.markdown("### 🎯 Words to Practice:")
+                                for word in analysis['words_incorrect']:
+                                    st.markdown(f"- {word}")
+
+                        # Overall feedback
+                        st.markdown("### 💡 Feedback & Suggestions")
+                        st.write(analysis['overall_feedback'])
+
+                        if analysis.get('specific_feedback'):
+                            st.markdown("**Specific Areas for Improvement:**")
+                            st.write(analysis['specific_feedback'])
+
+                        if analysis.get('suggestions'):
+                            st.markdown("**Practice Suggestions:**")
+                            st.write(analysis['suggestions'])
+
+                        # Try again button
+                        if st.button("🔄 Try Pronunciation Again", key="try_again_pronunciation"):
+                            session.pronunciation_analysis = None
+                            st.rerun(scope="fragment")
+
                     else:
-                        st.error("Could not evaluate the sentence. Please try again.")
-            else:
-                st.warning("Please enter a German sentence first!")
-                        
-    # Show audio buttons if evaluation is complete
-    if st.session_state.sentence_evaluation and st.session_state.show_audio_buttons:
-        evaluation = st.session_state.sentence_evaluation
-        user_sentence = st.session_state.user_sentence
-        
-        st.markdown("### 🔊 Listen & Practice")
-        col1, col2 = st.columns([1, 1])
-        
-        with col1:
-            if st.button("🔊 Hear Corrected Version", key="corrected_sentence_audio", use_container_width=True):
-                if not st.session_state.corrected_audio_generated:
-                    with st.spinner("Generating pronunciation..."):
-                        sentence_to_play = evaluation['corrected_sentence'] if evaluation['corrected_sentence'].lower() != user_sentence.lower() else user_sentence
-                        audio_data = generate_audio_with_openai(client, sentence_to_play)
-                        if audio_data:
-                            st.session_state.current_corrected_audio = audio_data
-                            st.session_state.corrected_audio_generated = True
-                        else:
-                            st.error("Could not generate audio for the sentence.")
-                
-                # Display audio if available
-                if st.session_state.current_corrected_audio:
-                    st.audio(st.session_state.current_corrected_audio, format='audio/mp3')
-        
-        with col2:
-            if st.button("🎯 Practice Pronunciation", key="practice_pronunciation", use_container_width=True):
-                st.session_state.pronunciation_mode = True
-                st.session_state.show_recording_interface = True
-                # Set the target sentence (use corrected version if available)
-                target_sentence = evaluation['corrected_sentence'] if evaluation['corrected_sentence'].lower() != user_sentence.lower() else user_sentence
-                st.session_state.target_pronunciation_sentence = target_sentence
-                
-                # Generate audio for the target sentence if not already generated
-                if not st.session_state.corrected_audio_generated:
-                    with st.spinner("Preparing pronunciation practice..."):
-                        audio_data = generate_audio_with_openai(client, target_sentence)
-                        if audio_data:
-                            st.session_state.current_corrected_audio = audio_data
-                            st.session_state.corrected_audio_generated = True
-        
-        # Pronunciation practice interface
-        if st.session_state.pronunciation_mode and st.session_state.show_recording_interface:
-            st.markdown("---")
-            st.markdown("### 🎤 Pronunciation Practice")
-            
-            # Show target sentence
-            st.info(f"**Target sentence:** {st.session_state.target_pronunciation_sentence}")
-            
-            # Play target audio
-            if st.session_state.current_corrected_audio:
-                st.markdown("**🔊 Listen to the correct pronunciation:**")
-                st.audio(st.session_state.current_corrected_audio, format='audio/mp3')
-            
-            st.markdown("**📱 Record your pronunciation:**")
-            st.markdown("""
-            1. Click the button below to start recording
-            2. Say the German sentence clearly
-            3. Upload your recording for AI analysis
-            """)
-            
-            # Audio recording interface
-            uploaded_audio = st.file_uploader(
-                "Record and upload your pronunciation:",
-                type=['wav', 'mp3', 'm4a', 'ogg', 'flac'],
-                key="pronunciation_audio",
-                help="Record yourself saying the German sentence and upload the audio file"
-            )
-            
-            if uploaded_audio is not None:
-                st.success("✅ Audio uploaded successfully!")
-                
-                # Show audio player for user's recording
-                st.markdown("**🎧 Your recording:**")
-                st.audio(uploaded_audio, format='audio/wav')
-                
-                # Analyze pronunciation button
-                if st.button("🤖 Analyze My Pronunciation", key="analyze_pronunciation", use_container_width=True):
-                    with st.spinner("🧠 AI is analyzing your pronunciation..."):
-                        # Transcribe the audio
-                        transcription = transcribe_audio_with_whisper(client, uploaded_audio)
-                        
-                        if transcription:
-                            st.markdown("### 📝 What you said:")
-                            st.write(f"*\"{transcription}\"*")
-                            
-                            # Analyze pronunciation
-                            analysis = analyze_pronunciation_with_openai(
-                                client, 
-                                st.session_state.target_pronunciation_sentence, 
-                                transcription, 
-                                st.session_state.difficulty_level
-                            )
-                            
-                            if analysis:
-                                st.session_state.pronunciation_analysis = analysis
-                                
-                                # Display pronunciation analysis
-                                score_class = analysis['pronunciation_score'].replace(' ', '_')
-                                
-                                st.markdown(f"""
-                                    <div class="evaluation-card {score_class}">
-                                        <h3>🎯 Pronunciation Analysis</h3>
-                                        <p><strong>Score:</strong> {analysis['pronunciation_score'].title()}</p>
-                                        <p><strong>Accuracy:</strong> {analysis.get('accuracy_percentage', 'N/A')}%</p>
-                                    </div>
-                                """, unsafe_allow_html=True)
-                                
-                                # Detailed feedback
-                                col1, col2 = st.columns([1, 1])
-                                
-                                with col1:
-                                    if analysis.get('words_correct'):
-                                        st.markdown("### ✅ Words Pronounced Well:")
-                                        for word in analysis['words_correct']:
-                                            st.markdown(f"- {word}")
-                                
-                                with col2:
-                                    if analysis.get('words_incorrect'):
-                                        st.markdown("### 🎯 Words to Practice:")
-                                        for word in analysis['words_incorrect']:
-                                            st.markdown(f"- {word}")
-                                
-                                # Overall feedback
-                                st.markdown("### 💡 Feedback & Suggestions")
-                                st.write(analysis['overall_feedback'])
-                                
-                                if analysis.get('specific_feedback'):
-                                    st.markdown("**Specific Areas for Improvement:**")
-                                    st.write(analysis['specific_feedback'])
-                                
-                                if analysis.get('suggestions'):
-                                    st.markdown("**Practice Suggestions:**")
-                                    st.write(analysis['suggestions'])
-                                
-                                # Try again button
-                                if st.button("🔄 Try Pronunciation Again", key="try_again_pronunciation"):
-                                    st.session_state.pronunciation_analysis = None
-                                    st.rerun()
-                            
-                            else:
-                                st.error("Could not analyze pronunciation. Please try again.")
-                        else:
-                            st.error("Could not transcribe your audio. Please ensure the recording is clear and try again.")
-            
-            # Instructions for recording
-            with st.expander("📱 How to Record Audio"):
-                st.markdown("""
-                **On Mobile/Tablet:**
-                - Use your device's voice recorder app
-                - Record yourself saying the German sentence
-                - Save as an audio file and upload here
-                
-                **On Computer:**
-                - Use your computer's built-in recorder (Windows Voice Recorder, macOS QuickTime, etc.)
-                - Online tools like [Online Voice Recorder](https://online-voice-recorder.com/)
-                - Record clearly and save as MP3, WAV, or M4A format
-                
-                **Tips for Better Results:**
-                - Speak clearly and at normal speed
-                - Record in a quiet environment
-                - Hold the microphone/device close to your mouth
-                - Try to match the rhythm and intonation of the target audio
-                """)
-    
-    # Original audio buttons section (keep for backward compatibility)
-    elif st.session_state.sentence_evaluation and st.session_state.show_audio_buttons and not st.session_state.pronunciation_mode:
-        evaluation = st.session_state.sentence_evaluation
-        user_sentence = st.session_state.user_sentence
-        
-        st.markdown("### 🔊 Listen to Pronunciations")
-        col1, col2 = st.columns([1, 1])
-        
-        with col1:
-            if st.button("🔊 Hear Your Sentence", key="user_sentence_audio", use_container_width=True):
-                if not st.session_state.user_audio_generated:
-                    with st.spinner("Generating pronunciation..."):
-                        audio_data = generate_audio_with_openai(client, user_sentence)
-                        if audio_data:
-                            st.session_state.current_user_audio = audio_data
-                            st.session_state.user_audio_generated = True
-                        else:
-                            st.error("Could not generate audio for your sentence.")
-                
-                # Display audio if available
-                if st.session_state.current_user_audio:
-                    st.audio(st.session_state.current_user_audio, format='audio/mp3')
-        
-        with col2:
-            # Always show the corrected version button, even if sentences are the same
-            sentence_to_play = evaluation['corrected_sentence'] if evaluation['corrected_sentence'].lower() != user_sentence.lower() else user_sentence
-            button_text = "🔊 Hear Corrected Version" if evaluation['corrected_sentence'].lower() != user_sentence.lower() else "🔊 Hear Sentence Again"
-            
-            if st.button(button_text, key="corrected_sentence_audio", use_container_width=True):
-                if not st.session_state.corrected_audio_generated:
-                    with st.spinner("Generating pronunciation..."):
-                        audio_data = generate_audio_with_openai(client, sentence_to_play)
-                        if audio_data:
-                            st.session_state.current_corrected_audio = audio_data
-                            st.session_state.corrected_audio_generated = True
-                        else:
-                            st.error("Could not generate audio for the corrected sentence.")
-                
-                # Display audio if available
-                if st.session_state.current_corrected_audio:
-                    st.audio(st.session_state.current_corrected_audio, format='audio/mp3')
-    
+                        st.error("Could not analyze pronunciation. Please try again.")
+                else:
+                    st.error("Could not transcribe your audio. Please ensure the recording is clear and try again.")
+
+                st.caption("⏱️ " + " · ".join(
+                    f"{stage.replace('_', ' ')}: {seconds:.2f}s" for stage, seconds in pipeline_timings.items()
+                ))
+                st.caption(
+                    f"📦 Upload: {audio_stats['original_bytes'] / 1024:.0f} KB → {audio_stats['processed_bytes'] / 1024:.0f} KB "
+                    f"({audio_stats['bytes_saved'] / max(audio_stats['original_bytes'], 1):.0%} smaller, "
+                    f"preprocessing took {audio_stats['preprocess_seconds']:.2f}s)"
+                )
+
+    # Instructions for recording
+    with st.expander("📱 How to Record Audio"):
+        st.markdown(RECORDING_HELP)
+
+# Main app: runs in full only on page load and on state changes that affect several sections
+@timed_run("rerun_full")
+def main():
+    st.set_page_config(
+        page_title="AI-Powered German Verb Practice",
+        page_icon="🇩🇪",
+        layout="centered",
+        initial_sidebar_state="expanded"
+    )
+
+    # Custom CSS
+    st.markdown(APP_CSS, unsafe_allow_html=True)
+
+    session = get_practice_session()
+    review_store = get_review_store()
+
+    # Sidebar for settings
+    with st.sidebar:
+        st.header("⚙️ Settings")
+
+        # Difficulty level selection
+        difficulty = st.selectbox(
+            "Select Difficulty Level:",
+            DIFFICULTY_LEVELS,
+            index=DIFFICULTY_LEVELS.index(session.difficulty_level)
+        )
+        session.difficulty_level = difficulty
+
+        # Named learners get persistent scores and spaced-repetition reviews
+        learner = st.text_input("Your name (saves your progress):", value=session.learner, key="learner_name").strip()
+        if learner != session.learner:
+            session.learner = learner
+            if learner:
+                session.correct_count, session.wrong_count = review_store.totals(learner)
+                session.total_count = session.correct_count + session.wrong_count
+        if session.learner:
+            due_count = review_store.due_count(session.learner)
+            st.caption(f"📅 {due_count} verb{'s' if due_count != 1 else ''} due for review")
+
+        st.markdown("---")
+        st.markdown("### 🔑 API Setup")
+        st.markdown("You need an OpenAI API key to use this app.")
+        st.markdown("[Get your API key here](https://platform.openai.com/api-keys)")
+
+        if st.button("🔄 Generate New Verb", use_container_width=True):
+            start_next_verb(session)
+            st.rerun()
+
+    # Initialize OpenAI client
+    client = get_openai_client()
+    if not client:
+        return
+
+    # Header
+    st.markdown(HEADER_HTML, unsafe_allow_html=True)
+
+    # Score card
+    st.markdown(f"""
+        <div class="score-card">
+            <div class="score-item">
+                <div>Correct Answers</div>
+                <div class="correct">{session.correct_count}</div>
+            </div>
+            <div class="score-item">
+                <div>Wrong Answers</div>
+                <div class="wrong">{session.wrong_count}</div>
+            </div>
+            <div class="score-item">
+                <div>Total</div>
+                <div class="total">{session.total_count}</div>
+            </div>
+        </div>
+    """, unsafe_allow_html=True)
+
+    verb_corpus = get_verb_corpus()
+    verb_pool = get_verb_pool(client.api_key)
+
+    # Generate verb data if not exists: due reviews first, then a new verb from the local corpus,
+    # then the prefetch pool, then a live call
+    if session.current_verb_data is None:
+        level = session.difficulty_level
+        verb_data = None
+        new_verb_exclusions = session.seen_verbs
+        if session.learner:
+            verb_data = review_store.next_due(session.learner, level, session.seen_verbs[-1:])
+            new_verb_exclusions = list(review_store.known_lemmas(session.learner).union(session.seen_verbs))
+        if verb_data is None:
+            verb_data = verb_corpus.pick(level, new_verb_exclusions)
+        if verb_data is None:
+            verb_data = verb_pool.get(client, level, new_verb_exclusions)
+            if verb_data is None:
+                with st.spinner("🤖 Generating new German verb with AI..."):
+                    verb_data = generate_verb_with_openai(client, level)
+            if verb_data:
+                verb_corpus.add(level, verb_data)  # Served verbs join the corpus; queued ones stay in the pool
+        if verb_data:
+            session.current_verb_data = verb_data
+            session.seen_verbs.append(verb_data["german_verb"].lower())
+            # The Listen buttons are usually the next thing clicked
+            speculate_verb_audio(client, verb_data, owner=st.session_state.practice_id)
+        else:
+            st.error("Failed to generate verb data. Please try again.")
+            return
+
+    # Diagnostics for tuning caches and spotting regressions under load
+    if is_admin_view():
+        render_admin_panel(verb_pool, verb_corpus, session)
+
+    verb_data = session.current_verb_data
+
+    # Verb card
+    st.markdown(f"""
+        <div class="verb-card">
+            <h2 style="text-align: center; color: #2c3e50;">What does the German verb '<b>{verb_data['german_verb']}</b>' mean in English?</h2>
+            <p style="text-align: center; color: #7f8c8d;">Category: {verb_data.get('verb_category', 'General')}</p>
+    """, unsafe_allow_html=True)
+
+    # Each section reruns on its own when its widgets change
+    translation_section(client, session, verb_data, review_store)
+
+    if session.translation_submitted:
+        sentence_section(client, session, verb_data, review_store)
+
+    if session.sentence_evaluation and session.show_audio_buttons:
+        listen_section(client, session)
+        if session.pronunciation_mode and session.show_recording_interface:
+            pronunciation_section(client, session)
+
     # Next verb button - show only if both translation and sentence are submitted
-    if st.session_state.translation_submitted and st.session_state.sentence_submitted:
+    if session.translation_submitted and session.sentence_submitted:
         st.markdown("---")
         if st.button("🔄 Next Verb →", key="next_verb", use_container_width=True):
-            reset_for_new_verb()
+            start_next_verb(session)
             st.rerun()
-    
+
     st.markdown("</div>", unsafe_allow_html=True)  # Close verb-card
-    
+
     # Footer
     st.markdown("---")
-    st.markdown("""
-        <div style="text-align: center; margin-top: 30px; color: #7f8c8d; font-size: 14px;">
-            <p>🤖 AI-Powered German verb practice with intelligent sentence evaluation</p>
-            <p>Built with Streamlit • 🇩🇪 Learn German Effectively</p>
-        </div>
-    """, unsafe_allow_html=True)
+    st.markdown(FOOTER_HTML, unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,19 @@
+import german2
+
+
+def feed_in_chunks(parser, text, size=3):
+    for start in range(0, len(text), size):
+        parser.feed(text[start:start + size])
+
+
+def test_raw_newlines_inside_strings_are_accepted():
+    parser = german2.IncrementalJSONParser()
+    feed_in_chunks(parser, '{"feedback": "Gut.\nWeiter so!", "is_grammatically_correct": true}')
+    assert parser.done
+    assert parser.fields == {"feedback": "Gut.\nWeiter so!", "is_grammatically_correct": True}
+
+
+def test_partial_string_with_a_control_character():
+    parser = german2.IncrementalJSONParser()
+    parser.feed('{"feedback": "Zeile eins\n\tZeile')
+    assert parser.partial_string("feedback") == "Zeile eins\n\tZeile"
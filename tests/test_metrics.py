@@ -0,0 +1,19 @@
+import german2
+
+
+def span(stage):
+    return {"stage": stage, "ts": 0.0, "ok": True, "seconds": 0.1}
+
+
+def test_file_is_rotated_and_reruns_sampled(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    recorder = german2.MetricsRecorder(path=path, max_bytes=2000, rerun_sample_rate=0)
+    for _ in range(200):
+        recorder.record(span("model:verb:gpt-4o-mini"))
+        recorder.record(span("rerun_full"))
+    recorder.metrics_file.flush()
+
+    assert (tmp_path / "metrics.jsonl").stat().st_size <= 2000
+    assert (tmp_path / "metrics.jsonl.1").stat().st_size <= 2000
+    assert "rerun_full" not in (tmp_path / "metrics.jsonl").read_text()
+    assert len(recorder.recent["rerun_full"]) == 200
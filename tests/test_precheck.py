@@ -0,0 +1,55 @@
+import pytest
+
+import german2
+
+
+@pytest.mark.parametrize("sentence, verb", [
+    ("Wir ziehen nächste Woche um", "umziehen"),
+    ("Ich nehme am Kurs teil", "teilnehmen"),
+    ("Das Konzert findet morgen statt", "stattfinden"),
+    ("Ich lerne ihn kennen", "kennenlernen"),
+    ("Wir gehen spazieren", "spazieren gehen"),
+    ("Ich gehe nach Hause", "gehen"),
+    ("Ich hätte gern einen Kaffee", "haben"),
+    ("Wir haben gestern eingekauft", "einkaufen"),
+    ("Ich habe das nicht verstanden", "verstehen"),
+    ("Ich freue mich auf das Wochenende", "sich freuen"),
+])
+def test_correct_sentences_reach_the_model(sentence, verb):
+    assert german2.precheck_german_sentence(sentence, verb) is None
+
+
+@pytest.mark.parametrize("sentence, verb", [
+    ("Ich esse ein Brot", "trinken"),
+    ("Wir spielen heute Fußball", "gehen"),
+    ("Ich esse ein Brot", "abholen"),
+])
+def test_sentences_without_a_covered_verb_are_rejected(sentence, verb):
+    evaluation = german2.precheck_german_sentence(sentence, verb)
+    assert evaluation is not None
+    assert evaluation["overall_score"] == "needs_improvement"
+
+
+def test_verbs_outside_the_tables_are_left_to_the_model():
+    assert german2.german_verb_forms("zwinkern") is None
+    assert german2.uses_german_verb(german2.normalize_german("Ich esse ein Brot"), "zwinkern") is None
+    assert german2.precheck_german_sentence("Ich esse ein Brot", "zwinkern") is None
+
+
+def test_skeleton_fallback_tries_the_word_with_and_without_ge():
+    assert german2._skeleton_match(["gehen"], "gehen")
+    assert german2._skeleton_match(["getrunken"], "trinken")
+
+
+@pytest.mark.parametrize("sentence, verb", [
+    ("Ich arbeite am Montag am Computer", "arbeiten"),
+    ("Ich bin am Abend am See", "sein"),
+    ("Am Montag gehe ich am Nachmittag schwimmen", "schwimmen"),
+])
+def test_german_am_is_not_taken_for_english(sentence, verb):
+    assert german2.precheck_german_sentence(sentence, verb) is None
+
+
+def test_english_sentence_is_caught_locally():
+    evaluation = german2.precheck_german_sentence("I go to the park every day", "gehen")
+    assert evaluation is not None
@@ -0,0 +1,33 @@
+import time
+
+import german2
+
+VERB = {
+    "german_verb": "gehen",
+    "english_translation": "to go",
+    "sample_sentence_german": "Ich gehe nach Hause.",
+    "sample_sentence_english": "I am going home.",
+    "verb_category": "movement",
+}
+
+
+def test_reschedule_in_one_process_is_seen_by_another(tmp_path):
+    path = str(tmp_path / "reviews.db")
+    first, second = german2.ReviewStore(path), german2.ReviewStore(path)
+    first.record("ann", "beginner", VERB, "translation", 1)
+    with first.conn:
+        first.conn.execute("UPDATE reviews SET due = ?", (time.time() - 1,))
+    assert second.next_due("ann", "beginner")["german_verb"] == "gehen"
+
+    second.record("ann", "beginner", VERB, "translation", 5)
+    assert first.next_due("ann", "beginner") is None
+    assert first.due_count("ann") == 0
+    assert first.known_lemmas("ann") == {"gehen"}
+
+
+def test_excluded_lemmas_are_skipped(tmp_path):
+    store = german2.ReviewStore(str(tmp_path / "reviews.db"))
+    store.record("ann", "beginner", VERB, "translation", 1)
+    with store.conn:
+        store.conn.execute("UPDATE reviews SET due = ?", (time.time() - 1,))
+    assert store.next_due("ann", "beginner", ["gehen"]) is None
@@ -0,0 +1,33 @@
+import pytest
+
+import german2
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("needs", "to need"),
+    ("to feed", "to feed"),
+    ("goes", "to go"),
+    ("playing", "to play"),
+])
+def test_word_forms_are_graded_correct(answer, expected):
+    assert german2.grade_translation(answer, expected) == "correct"
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("to thank", "to think"),
+    ("to carry", "to marry"),
+    ("to spell", "to sell"),
+    ("to shoot", "to shout"),
+])
+def test_short_near_misses_are_left_to_the_model(answer, expected):
+    assert german2.grade_translation(answer, expected) == "ambiguous"
+
+
+def test_typos_in_longer_words_still_pass():
+    assert german2.grade_translation("to rememberr", "to remember") == "correct"
+    assert german2.grade_translation("to understnd", "to understand") == "correct"
+
+
+def test_base_verbs_ending_in_ed_keep_their_stem():
+    assert german2.english_stem("need") == german2.english_stem("needs") == "need"
+    assert german2.english_stem("walked") == german2.english_stem("walk")
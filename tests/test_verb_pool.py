@@ -0,0 +1,54 @@
+import json
+import time
+
+import german2
+
+
+def verb(lemma):
+    return {
+        "german_verb": lemma,
+        "english_translation": "to test",
+        "sample_sentence_german": f"Ich {lemma}.",
+        "sample_sentence_english": "I test.",
+        "verb_category": "other",
+    }
+
+
+def wait_for_refill(pool, level):
+    deadline = time.time() + 5
+    while level in pool.refilling and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_pool_full_of_seen_verbs_recovers(monkeypatch):
+    fresh = iter(range(1000))
+    monkeypatch.setattr(
+        german2, "request_verbs_batch_from_openai",
+        lambda client, level, count: [verb(f"neu{next(fresh)}") for _ in range(count)],
+    )
+    pool = german2.VerbPrefetchPool(target_size=3, batch_size=2)
+    seen = [f"alt{i}" for i in range(6)]
+    for lemma in seen:
+        pool.backend.push("verb_pool", "beginner", json.dumps(verb(lemma)))
+
+    assert pool.get(object(), "beginner", seen) is None
+    wait_for_refill(pool, "beginner")
+    assert pool.get(object(), "beginner", seen)["german_verb"].startswith("neu")
+
+
+def test_refill_stops_when_batches_bring_nothing_new(monkeypatch):
+    calls = []
+
+    def same_batch(client, level, count):
+        calls.append(level)
+        return [verb("gehen")]
+
+    monkeypatch.setattr(german2, "request_verbs_batch_from_openai", same_batch)
+    pool = german2.VerbPrefetchPool(target_size=3, batch_size=2)
+    pool.client = object()
+    pool.refill("beginner")
+    wait_for_refill(pool, "beginner")
+
+    assert "beginner" not in pool.refilling
+    assert pool.backend.length("verb_pool", "beginner") == 1
+    assert len(calls) == 2